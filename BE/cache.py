@@ -0,0 +1,32 @@
+"""
+Helper cache berversi: data di-cache dengan key yang memuat nomor versi,
+invalidasi cukup menaikkan versi (key lama dibiarkan kedaluwarsa).
+
+Versi hanya konsisten antar worker bila CACHES memakai backend bersama
+(database/Redis), bukan LocMemCache per proses; lihat settings.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _version_key(name):
+    return f'{name}:version'
+
+
+def get_version(name):
+    version = cache.get(_version_key(name))
+    if version is None:
+        # Mulai dari timestamp agar tidak bertabrakan dengan versi lama yang ter-evict
+        cache.add(_version_key(name), int(time.time() * 1000), timeout=None)
+        version = cache.get(_version_key(name))
+    return version
+
+
+def bump_version(name):
+    try:
+        return cache.incr(_version_key(name))
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(_version_key(name), version, timeout=None)
+        return version
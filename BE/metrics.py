@@ -0,0 +1,70 @@
+"""
+Counter dan histogram in-process sederhana untuk monitoring (retry, cache
+hit/miss, query per request, dll).
+
+Nilai disimpan per proses worker; agregasi antar worker dilakukan di luar
+aplikasi (log / scraper).
+"""
+import bisect
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_histograms = {}
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def get(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def observe(name, value, buckets):
+    """
+    Catat satu nilai ke histogram `name`. buckets adalah batas atas yang
+    terurut naik; nilai di atas batas terakhir masuk bucket '+Inf'.
+    """
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = {
+                'buckets': list(buckets),
+                'counts': [0] * (len(buckets) + 1),
+                'count': 0,
+                'sum': 0,
+                'max': 0,
+            }
+        histogram['counts'][bisect.bisect_left(histogram['buckets'], value)] += 1
+        histogram['count'] += 1
+        histogram['sum'] += value
+        histogram['max'] = max(histogram['max'], value)
+
+
+def histograms():
+    with _lock:
+        return {
+            name: {
+                'count': histogram['count'],
+                'sum': histogram['sum'],
+                'avg': histogram['sum'] / histogram['count'],
+                'max': histogram['max'],
+                'buckets': dict(zip([*map(str, histogram['buckets']), '+Inf'], histogram['counts'])),
+            }
+            for name, histogram in _histograms.items()
+        }
+
+
+def snapshot():
+    with _lock:
+        return dict(_counters)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
@@ -0,0 +1,120 @@
+"""
+Instrumentasi per request: jumlah query SQL, waktu DB, waktu view/serializer,
+waktu render dan ukuran response, dikelompokkan per nama URL
+(resolver_match.url_name, mis. 'product-list').
+
+Hasilnya masuk histogram BE.metrics (lihat endpoint /api/metrics/). Jika
+SLOW_QUERY_THRESHOLD_MS diisi, query lambat juga ditangkap (BE.slow_queries).
+Budget query per endpoint diatur lewat settings.QUERY_BUDGETS; jika terlampaui
+ditulis warning, atau raise QueryBudgetExceeded bila QUERY_BUDGET_STRICT
+(aktif saat menjalankan test).
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from BE import metrics, slow_queries
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500]
+MS_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+BYTES_BUCKETS = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # alias -> SlowQueryRecorder; query EXPLAIN/savepoint miliknya tidak dihitung
+        self.recorders = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        recorder = self.recorders.get(context['connection'].alias)
+        if recorder is not None and recorder.explaining:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    serializer_ms adalah pendekatan: waktu di dalam view di luar query DB
+    (membangun serializer.data dsb.) ditambah waktu render response. Untuk
+    StreamingHttpResponse, query yang jalan saat streaming tidak ikut terhitung.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = _QueryCounter()
+        start = time.perf_counter()
+        capture_slow = slow_queries.threshold_ms() is not None
+        with ExitStack() as stack:
+            for connection in connections.all():
+                # Recorder di luar counter: waktu EXPLAIN tidak masuk durasi query yang diukur
+                if capture_slow:
+                    recorder = slow_queries.SlowQueryRecorder(request, connection)
+                    counter.recorders[connection.alias] = recorder
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.url_name if match and match.url_name else 'unresolved'
+        db_ms = counter.duration * 1000
+        view_ms = getattr(request, '_metrics_view_ms', None)
+        render_ms = getattr(request, '_metrics_render_ms', 0.0)
+
+        prefix = f'http.{endpoint}'
+        metrics.incr(f'{prefix}.requests')
+        metrics.observe(f'{prefix}.queries', counter.count, QUERY_BUCKETS)
+        metrics.observe(f'{prefix}.db_ms', db_ms, MS_BUCKETS)
+        metrics.observe(f'{prefix}.total_ms', total * 1000, MS_BUCKETS)
+        if view_ms is not None:
+            metrics.observe(f'{prefix}.serializer_ms', max(view_ms - db_ms, 0) + render_ms, MS_BUCKETS)
+        if not response.streaming:
+            metrics.observe(f'{prefix}.bytes', len(response.content), BYTES_BUCKETS)
+
+        if getattr(settings, 'QUERY_COUNT_HEADER', True):
+            response['X-Query-Count'] = str(counter.count)
+
+        self.check_budget(endpoint, counter.count)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Response DRF adalah TemplateResponse: view sudah selesai, render belum
+        start = getattr(request, '_metrics_view_start', None)
+        if start is not None:
+            selesai = time.perf_counter()
+            request._metrics_view_ms = (selesai - start) * 1000
+            response.add_post_render_callback(
+                lambda rendered: setattr(request, '_metrics_render_ms', (time.perf_counter() - selesai) * 1000)
+            )
+        return response
+
+    def check_budget(self, endpoint, count):
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(endpoint)
+        if budget is None or count <= budget:
+            return
+        metrics.incr(f'http.{endpoint}.over_budget')
+        message = f"Endpoint '{endpoint}' menjalankan {count} query (budget {budget})."
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
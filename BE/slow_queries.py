@@ -0,0 +1,120 @@
+"""
+Penangkap query lambat (opt-in lewat settings.SLOW_QUERY_THRESHOLD_MS).
+
+Query yang durasinya melewati threshold dicatat bersama endpoint, frame
+kode aplikasi yang memicunya (view/serializer di SLOW_QUERY_APPS) dan, di
+PostgreSQL, contoh plan EXPLAIN (ANALYZE, BUFFERS) untuk SELECT. Catatan
+disimpan di ring buffer in-process dan bisa dilihat admin di
+/api/metrics/slow-queries/.
+"""
+import random
+import threading
+import time
+import traceback
+from collections import deque
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+MAX_SQL_LENGTH = 4000
+
+_lock = threading.Lock()
+_buffer = deque(maxlen=200)
+
+
+def threshold_ms():
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+
+
+def entries():
+    with _lock:
+        return list(reversed(_buffer))
+
+
+def clear():
+    with _lock:
+        _buffer.clear()
+
+
+def _record(entry):
+    global _buffer
+    size = getattr(settings, 'SLOW_QUERY_BUFFER_SIZE', 200)
+    with _lock:
+        if _buffer.maxlen != size:
+            _buffer = deque(_buffer, maxlen=size)
+        _buffer.append(entry)
+
+
+def _app_frames():
+    """Frame dari kode aplikasi (bukan Django/DRF/middleware), paling dalam di akhir."""
+    base_dir = Path(settings.BASE_DIR)
+    apps = getattr(settings, 'SLOW_QUERY_APPS', ['product', 'toko', 'user'])
+    frames = []
+    for frame in traceback.extract_stack()[:-3]:
+        try:
+            relative = Path(frame.filename).resolve().relative_to(base_dir)
+        except ValueError:
+            continue
+        if relative.parts and relative.parts[0] in apps:
+            frames.append(f"{relative}:{frame.lineno} in {frame.name}")
+    return frames
+
+
+class SlowQueryRecorder:
+    """execute_wrapper yang mencatat query lambat selama satu request."""
+
+    def __init__(self, request, connection):
+        self.request = request
+        self.connection = connection
+        self.threshold = threshold_ms()
+        # True selama EXPLAIN berjalan; query-nya tidak dicatat maupun dihitung middleware
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        durasi_ms = (time.perf_counter() - start) * 1000
+        if durasi_ms >= self.threshold:
+            self.record(sql, params, many, durasi_ms)
+        return result
+
+    def record(self, sql, params, many, durasi_ms):
+        match = getattr(self.request, 'resolver_match', None)
+        frames = _app_frames()
+        _record({
+            'waktu': timezone.now().isoformat(),
+            'endpoint': match.url_name if match else None,
+            'method': self.request.method,
+            'path': self.request.get_full_path(),
+            'durasi_ms': round(durasi_ms, 2),
+            'sql': sql[:MAX_SQL_LENGTH],
+            'params': repr(params)[:MAX_SQL_LENGTH],
+            'lokasi': frames[-1] if frames else None,
+            'stack': frames[-5:],
+            'plan': None if many else self.explain(sql, params),
+        })
+
+    def explain(self, sql, params):
+        """Plan EXPLAIN (ANALYZE, BUFFERS) untuk SELECT di PostgreSQL, sesuai sample rate."""
+        if self.connection.vendor != 'postgresql' or not sql.lstrip().upper().startswith('SELECT'):
+            return None
+        if not getattr(settings, 'SLOW_QUERY_EXPLAIN', True):
+            return None
+        if random.random() >= getattr(settings, 'SLOW_QUERY_EXPLAIN_SAMPLE', 0.1):
+            return None
+
+        self.explaining = True
+        try:
+            # Savepoint agar EXPLAIN yang gagal tidak membatalkan transaksi request
+            with transaction.atomic(using=self.connection.alias):
+                with self.connection.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+                    return '\n'.join(row[0] for row in cursor.fetchall())
+        except DatabaseError as exc:
+            return f"EXPLAIN gagal: {exc}"
+        finally:
+            self.explaining = False
@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from .views import metrics_view, slow_queries_view
 
 schema_view = get_schema_view(
    openapi.Info(
@@ -34,6 +35,8 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='swagger-ui'), 
     path('admin/', admin.site.urls),
+    path('api/metrics/', metrics_view, name='metrics'),
+    path('api/metrics/slow-queries/', slow_queries_view, name='slow-queries'),
     path('api/', include('toko.urls')),
     path('api/', include('product.urls')),
     path('auth/', include('user.urls')),
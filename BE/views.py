@@ -0,0 +1,33 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from BE import metrics, slow_queries
+from user.permissions import IsAdminRole
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminRole])
+def metrics_view(request):
+    """Counter dan histogram per endpoint (query, waktu DB, serializer, ukuran) di worker ini."""
+    endpoint = request.query_params.get('endpoint')
+    histograms = metrics.histograms()
+    counters = metrics.snapshot()
+    if endpoint:
+        prefix = f'http.{endpoint}.'
+        histograms = {name: value for name, value in histograms.items() if name.startswith(prefix)}
+        counters = {name: value for name, value in counters.items() if name.startswith(prefix)}
+    return Response({'counters': counters, 'histograms': histograms})
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated, IsAdminRole])
+def slow_queries_view(request):
+    """Query lambat terbaru (paling baru di awal); DELETE mengosongkan buffer."""
+    if request.method == 'DELETE':
+        slow_queries.clear()
+        return Response(status=204)
+    return Response({
+        'threshold_ms': slow_queries.threshold_ms(),
+        'results': slow_queries.entries(),
+    })
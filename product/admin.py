@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import (
-    Product, Harga, Stock, Suplier, ProductInSuplier,
+    Product, Harga, RiwayatHarga, Stock, StockMovement, Suplier, ProductInSuplier,
     Belanja, ItemBelanja,
     TransaksiPengambilan, ItemPengambilan,
     TransaksiPembayaran, ItemPembayaran
@@ -29,6 +29,20 @@ class ProductAdmin(admin.ModelAdmin):
     inlines = [HargaInline, StockInline]
 
 
+@admin.register(RiwayatHarga)
+class RiwayatHargaAdmin(admin.ModelAdmin):
+    list_display = ('product', 'tipe_harga', 'harga', 'berlaku_mulai', 'created_at')
+    list_filter = ('tipe_harga',)
+    search_fields = ('product__nama',)
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('product', 'delta', 'reason', 'source_id', 'created_at')
+    list_filter = ('reason',)
+    search_fields = ('product__nama',)
+
+
 @admin.register(Suplier)
 class SuplierAdmin(admin.ModelAdmin):
     list_display = ( 'pt', 'nama', 'telepon', 'is_aktif')
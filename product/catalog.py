@@ -0,0 +1,38 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from BE.cache import get_version, bump_version
+
+CACHE_NAME = 'catalog'
+CACHE_TIMEOUT = 60 * 60
+
+
+def bump_catalog_version():
+    """Naikkan versi katalog setelah transaksi yang sedang berjalan commit."""
+    transaction.on_commit(lambda: bump_version(CACHE_NAME))
+
+
+def get_catalog_version():
+    return get_version(CACHE_NAME)
+
+
+def catalog_etag(version, variant=''):
+    return f'"catalog-{version}{variant}"'
+
+
+def etag_match(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return '*' in tags or etag in tags
+
+
+def get_catalog(version, build, variant=''):
+    """Payload katalog ter-render untuk versi tertentu; build() dipanggil saat cache miss."""
+    key = f'{CACHE_NAME}:{version}{variant}'
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,49 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from BE.cache import get_version, bump_version
+from toko.models import Jalur
+from .models import Product, Suplier, TransaksiPengambilan, TransaksiPembayaran
+
+CACHE_NAME = 'dashboard'
+CACHE_TIMEOUT = 60 * 10
+
+
+def invalidate_dashboard():
+    transaction.on_commit(lambda: bump_version(CACHE_NAME))
+
+
+def _hitung_summary(user=None):
+    pengambilan = TransaksiPengambilan.objects.filter(tanggal_pengambilan=timezone.localdate())
+    piutang = TransaksiPembayaran.objects.exclude(status_pembayaran='lunas')
+    jalur = Jalur.objects.all()
+    if user is not None:
+        pengambilan = pengambilan.filter(user=user)
+        piutang = piutang.filter(user=user)
+        jalur = jalur.filter(users=user)
+
+    return {
+        'product_count': Product.objects.filter(is_delete=False).count(),
+        'suplier_count': Suplier.objects.count(),
+        'sales_count': User.objects.filter(groups__name='sales').count(),
+        'jalur_count': jalur.count(),
+        'pengambilan_hari_ini': pengambilan.aggregate(total=Sum('total_pengambilan'))['total'] or 0,
+        'piutang': piutang.aggregate(total=Sum('kekurangan_bayar'))['total'] or 0,
+    }
+
+
+def get_summary(user=None):
+    """
+    Ringkasan dashboard. user=None untuk admin (semua data), selain itu
+    jalur, pengambilan hari ini dan piutang dibatasi milik user tersebut.
+    """
+    scope = 'all' if user is None else f'user:{user.pk}'
+    key = f'{CACHE_NAME}:{get_version(CACHE_NAME)}:{timezone.localdate().isoformat()}:{scope}'
+    summary = cache.get(key)
+    if summary is None:
+        summary = _hitung_summary(user)
+        cache.set(key, summary, CACHE_TIMEOUT)
+    return summary
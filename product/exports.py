@@ -0,0 +1,80 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ItemPengambilan, ItemPembayaran
+
+CHUNK_SIZE = 2000
+
+PENGAMBILAN_FIELDS = [
+    ('transaksi_id', 'transaksi_id'),
+    ('tanggal_pengambilan', 'transaksi__tanggal_pengambilan'),
+    ('sales', 'transaksi__user__username'),
+    ('jalur', 'transaksi__jalur__nama'),
+    ('is_konfirmasi', 'transaksi__is_konfirmasi'),
+    ('total_pengambilan', 'transaksi__total_pengambilan'),
+    ('item_id', 'id'),
+    ('product_id', 'product_id'),
+    ('product', 'product__nama'),
+    ('tipe_item', 'tipe_item'),
+    ('quantity', 'quantity'),
+    ('harga_satuan', 'harga_satuan'),
+    ('subtotal', 'subtotal'),
+]
+
+PEMBAYARAN_FIELDS = [
+    ('pembayaran_id', 'transaksi_pembayaran_id'),
+    ('tanggal_pembayaran', 'transaksi_pembayaran__tanggal_pembayaran'),
+    ('sales', 'transaksi_pembayaran__user__username'),
+    ('jalur', 'transaksi_pembayaran__jalur__nama'),
+    ('total_pengambilan', 'transaksi_pembayaran__total_pengambilan'),
+    ('jumlah_dibayar', 'transaksi_pembayaran__jumlah_dibayar'),
+    ('kekurangan_bayar', 'transaksi_pembayaran__kekurangan_bayar'),
+    ('status_pembayaran', 'transaksi_pembayaran__status_pembayaran'),
+    ('item_id', 'id'),
+    ('item_pengambilan_id', 'item_pengambilan_id'),
+    ('product', 'item_pengambilan__product__nama'),
+    ('quantity', 'quantity'),
+    ('harga_satuan', 'harga_satuan'),
+    ('subtotal', 'subtotal'),
+]
+
+
+def pengambilan_rows(tanggal_dari=None, tanggal_sampai=None):
+    queryset = ItemPengambilan.objects.all()
+    if tanggal_dari:
+        queryset = queryset.filter(transaksi__tanggal_pengambilan__gte=tanggal_dari)
+    if tanggal_sampai:
+        queryset = queryset.filter(transaksi__tanggal_pengambilan__lte=tanggal_sampai)
+    queryset = queryset.order_by('transaksi_id', 'id')
+    return queryset.values_list(*[lookup for _, lookup in PENGAMBILAN_FIELDS]).iterator(chunk_size=CHUNK_SIZE)
+
+
+def pembayaran_rows(tanggal_dari=None, tanggal_sampai=None):
+    queryset = ItemPembayaran.objects.all()
+    if tanggal_dari:
+        queryset = queryset.filter(transaksi_pembayaran__tanggal_pembayaran__gte=tanggal_dari)
+    if tanggal_sampai:
+        queryset = queryset.filter(transaksi_pembayaran__tanggal_pembayaran__lte=tanggal_sampai)
+    queryset = queryset.order_by('transaksi_pembayaran_id', 'id')
+    return queryset.values_list(*[lookup for _, lookup in PEMBAYARAN_FIELDS]).iterator(chunk_size=CHUNK_SIZE)
+
+
+class Echo:
+    """Pseudo-buffer untuk csv.writer: write() langsung mengembalikan baris."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(fields, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in fields])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(fields, rows):
+    names = [name for name, _ in fields]
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n'
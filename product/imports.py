@@ -0,0 +1,82 @@
+import csv
+import io
+
+from django.db import transaction
+
+from .catalog import bump_catalog_version
+from .dashboard import invalidate_dashboard
+from .models import Product, Stock, Harga, RiwayatHarga
+from .pricing import invalidate_harga
+from .serializers import ProductSerializer
+
+MAX_ROWS = 1000
+TIPE_HARGA = [tipe for tipe, _ in Harga.TIPE_HARGA_CHOICES]
+
+
+def parse_csv(file):
+    """
+    Baca CSV produk menjadi list dict berbentuk payload ProductSerializer.
+    Kolom: nama, foto_product, lalu satu kolom per tipe harga (mis. "Harga ke toko");
+    sel harga kosong berarti tipe harga tersebut tidak dibuat.
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8-sig')
+    rows = []
+    for row in csv.DictReader(text):
+        rows.append({
+            'nama': (row.get('nama') or '').strip(),
+            'foto_product': (row.get('foto_product') or '').strip(),
+            'harga_list': [
+                {'tipe_harga': tipe, 'harga': row[tipe].strip()}
+                for tipe in TIPE_HARGA
+                if (row.get(tipe) or '').strip()
+            ],
+        })
+    return rows
+
+
+def validate_rows(rows):
+    """Validasi semua baris sekaligus. Return (validated_data, errors per baris)."""
+    valid, errors = [], []
+    nama_dipakai = set(
+        Product.objects.filter(is_delete=False, nama__in=[row.get('nama') for row in rows if isinstance(row, dict)])
+        .values_list('nama', flat=True)
+    )
+    for index, row in enumerate(rows, start=1):
+        serializer = ProductSerializer(data=row)
+        if not serializer.is_valid():
+            errors.append({'baris': index, 'errors': serializer.errors})
+            continue
+        nama = serializer.validated_data['nama']
+        if nama in nama_dipakai:
+            errors.append({'baris': index, 'errors': {'nama': [f"Produk '{nama}' sudah ada."]}})
+            continue
+        nama_dipakai.add(nama)
+        valid.append(serializer.validated_data)
+    return valid, errors
+
+
+@transaction.atomic
+def import_products(validated_rows):
+    """Bulk insert Product, Stock (quantity 0), Harga dan riwayatnya."""
+    products = Product.objects.bulk_create([
+        Product(nama=row['nama'], foto_product=row['foto_product']) for row in validated_rows
+    ])
+    Stock.objects.bulk_create([Stock(product_id=product, quantity=0) for product in products])
+
+    hargas = [
+        Harga(product=product, **harga)
+        for product, row in zip(products, validated_rows)
+        for harga in row['harga_list']
+    ]
+    hargas = Harga.objects.bulk_create(hargas, batch_size=1000)
+    # bulk_create tidak memicu signal: riwayat & invalidasi cache ditulis langsung
+    RiwayatHarga.objects.bulk_create([
+        RiwayatHarga(product_id=harga.product_id, tipe_harga=harga.tipe_harga,
+                     harga=harga.harga, berlaku_mulai=harga.created_at)
+        for harga in hargas
+    ], batch_size=1000)
+
+    bump_catalog_version()
+    invalidate_harga()
+    invalidate_dashboard()
+    return products
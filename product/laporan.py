@@ -0,0 +1,174 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Sum, Q, F, Value, DecimalField, IntegerField, Case, When
+from django.db.models.functions import Coalesce, TruncWeek, TruncMonth
+from django.utils import timezone
+
+from .models import RekapPiutang, RekapPenjualanHarian, ItemPengambilan
+
+AGING_BUCKETS = [
+    # (nama, umur minimal, umur maksimal) dalam hari sejak tanggal_pembayaran
+    ('hari_0_7', 0, 7),
+    ('hari_8_30', 8, 30),
+    ('hari_31_60', 31, 60),
+    ('hari_60_plus', 61, None),
+]
+
+
+def nilai_piutang(pembayaran):
+    if pembayaran.status_pembayaran == 'lunas':
+        return 0
+    return max(pembayaran.kekurangan_bayar, 0)
+
+
+def catat_perubahan_piutang(pembayaran, piutang_lama):
+    """
+    Terapkan selisih piutang satu TransaksiPembayaran ke RekapPiutang dengan
+    update F() (aman dipanggil paralel dari beberapa transaksi).
+    """
+    piutang_baru = nilai_piutang(pembayaran)
+    delta = piutang_baru - piutang_lama
+    delta_jumlah = int(piutang_baru > 0) - int(piutang_lama > 0)
+    if not delta and not delta_jumlah:
+        return
+
+    rekap, _ = RekapPiutang.objects.get_or_create(
+        user_id=pembayaran.user_id,
+        jalur_id=pembayaran.jalur_id,
+        tanggal=pembayaran.tanggal_pembayaran,
+    )
+    RekapPiutang.objects.filter(pk=rekap.pk).update(
+        sisa=F('sisa') + delta,
+        jumlah_transaksi=F('jumlah_transaksi') + delta_jumlah,
+        updated_at=timezone.now()
+    )
+
+
+def aging_piutang(hari_ini=None):
+    """Piutang per sales & jalur, dikelompokkan berdasarkan umur tagihan."""
+    hari_ini = hari_ini or timezone.localdate()
+    buckets = {}
+    for nama, umur_min, umur_max in AGING_BUCKETS:
+        kondisi = Q(tanggal__lte=hari_ini - timedelta(days=umur_min))
+        if umur_max is not None:
+            kondisi &= Q(tanggal__gte=hari_ini - timedelta(days=umur_max))
+        buckets[nama] = Coalesce(Sum('sisa', filter=kondisi), Value(0), output_field=DecimalField())
+
+    return list(
+        RekapPiutang.objects.filter(sisa__gt=0)
+        .values('user_id', 'user__username', 'jalur_id', 'jalur__nama')
+        .annotate(**buckets, total=Sum('sisa'), jumlah_transaksi=Sum('jumlah_transaksi'))
+        .order_by('user__username', 'jalur__nama')
+    )
+
+
+TIPE_ITEM = [tipe for tipe, _ in ItemPengambilan.TIPE_ITEM_CHOICES]
+
+LAPORAN_GROUP = {
+    'product': ('product_id', 'product__nama'),
+    'jalur': ('jalur_id', 'jalur__nama'),
+    'sales': ('user_id', 'user__username'),
+}
+
+LAPORAN_PERIODE = {
+    'harian': None,
+    'mingguan': TruncWeek,
+    'bulanan': TruncMonth,
+}
+
+
+def _item_penjualan(queryset):
+    """Agregasi ItemPengambilan ke kunci rollup (tanggal, product, sales, jalur, tipe_item)."""
+    return (
+        queryset.values('transaksi__tanggal_pengambilan', 'product_id', 'transaksi__user_id',
+                        'transaksi__jalur_id', 'tipe_item')
+        .annotate(jumlah=Sum('quantity'), nilai=Sum('subtotal'))
+        .order_by()
+    )
+
+
+def catat_penjualan(transaksi):
+    """
+    Tambahkan item satu transaksi yang baru dikonfirmasi ke RekapPenjualanHarian.
+    Baris rollup dibuat bila belum ada, lalu ditambah dengan satu UPDATE F().
+    """
+    rows = list(_item_penjualan(ItemPengambilan.objects.filter(transaksi=transaksi)))
+    if not rows:
+        return
+
+    kunci = dict(tanggal=transaksi.tanggal_pengambilan, user_id=transaksi.user_id, jalur_id=transaksi.jalur_id)
+    RekapPenjualanHarian.objects.bulk_create([
+        RekapPenjualanHarian(product_id=row['product_id'], tipe_item=row['tipe_item'], **kunci)
+        for row in rows
+    ], ignore_conflicts=True)
+
+    rekap_ids = {
+        (product_id, tipe_item): pk
+        for pk, product_id, tipe_item in RekapPenjualanHarian.objects.filter(
+            product_id__in={row['product_id'] for row in rows}, **kunci
+        ).values_list('pk', 'product_id', 'tipe_item')
+    }
+    quantity_cases, subtotal_cases = [], []
+    for row in rows:
+        pk = rekap_ids[(row['product_id'], row['tipe_item'])]
+        quantity_cases.append(When(pk=pk, then=F('quantity') + row['jumlah']))
+        subtotal_cases.append(When(pk=pk, then=F('subtotal') + row['nilai']))
+
+    RekapPenjualanHarian.objects.filter(pk__in=rekap_ids.values()).update(
+        quantity=Case(*quantity_cases, default=F('quantity'), output_field=IntegerField()),
+        subtotal=Case(*subtotal_cases, default=F('subtotal'), output_field=DecimalField()),
+        updated_at=timezone.now(),
+    )
+
+
+@transaction.atomic
+def rekonsiliasi_penjualan(dari=None, sampai=None):
+    """
+    Hitung ulang RekapPenjualanHarian dari ItemPengambilan terkonfirmasi untuk
+    rentang tanggal (inklusif). Tanpa rentang berarti seluruh riwayat.
+    """
+    items = ItemPengambilan.objects.filter(transaksi__is_konfirmasi=True)
+    rekap = RekapPenjualanHarian.objects.all()
+    if dari:
+        items = items.filter(transaksi__tanggal_pengambilan__gte=dari)
+        rekap = rekap.filter(tanggal__gte=dari)
+    if sampai:
+        items = items.filter(transaksi__tanggal_pengambilan__lte=sampai)
+        rekap = rekap.filter(tanggal__lte=sampai)
+
+    rekap.delete()
+    return len(RekapPenjualanHarian.objects.bulk_create([
+        RekapPenjualanHarian(
+            tanggal=row['transaksi__tanggal_pengambilan'],
+            product_id=row['product_id'],
+            user_id=row['transaksi__user_id'],
+            jalur_id=row['transaksi__jalur_id'],
+            tipe_item=row['tipe_item'],
+            quantity=row['jumlah'],
+            subtotal=row['nilai'],
+        )
+        for row in _item_penjualan(items).iterator()
+    ], batch_size=1000))
+
+
+def laporan_penjualan(dari, sampai, group='product', periode=None):
+    """
+    Quantity dan nilai penjualan per group (product/jalur/sales), dipecah per
+    tipe_item, hanya dari RekapPenjualanHarian. periode: harian/mingguan/bulanan,
+    None berarti total untuk seluruh rentang.
+    """
+    fields = list(LAPORAN_GROUP[group])
+    queryset = RekapPenjualanHarian.objects.filter(tanggal__gte=dari, tanggal__lte=sampai)
+    if periode:
+        trunc = LAPORAN_PERIODE[periode]
+        queryset = queryset.annotate(periode=trunc('tanggal') if trunc else F('tanggal'))
+        fields.insert(0, 'periode')
+
+    agregasi = {'total': Coalesce(Sum('subtotal'), Value(0), output_field=DecimalField())}
+    for tipe in TIPE_ITEM:
+        agregasi[f'quantity_{tipe}'] = Coalesce(Sum('quantity', filter=Q(tipe_item=tipe)), Value(0))
+        agregasi[f'subtotal_{tipe}'] = Coalesce(
+            Sum('subtotal', filter=Q(tipe_item=tipe)), Value(0), output_field=DecimalField()
+        )
+    return list(queryset.values(*fields).annotate(**agregasi).order_by(*fields))
@@ -0,0 +1,189 @@
+import json
+import math
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, OuterRef, Subquery
+
+from product.models import Harga, TransaksiPengambilan, TransaksiPembayaran
+from toko.models import Jalur
+
+SKENARIO = ['katalog', 'jalur', 'riwayat', 'pengambilan', 'update', 'pembayaran']
+
+
+def percentile(values, p):
+    """Persentil nearest-rank dari list yang sudah terurut."""
+    if not values:
+        return 0
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark endpoint DRF lewat HTTP dengan beberapa client paralel terhadap server yang "
+        "sudah berjalan (runserver/gunicorn) dengan database hasil seed_bakery. Melaporkan latency "
+        "p50/p95/p99, throughput dan jumlah query (header X-Query-Count) per skenario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--password', default='bench12345')
+        parser.add_argument('--clients', type=int, default=10, help="Jumlah client paralel")
+        parser.add_argument('--requests', type=int, default=200, help="Jumlah request per skenario")
+        parser.add_argument('--warmup', type=int, default=5, help="Request pemanasan per skenario (tidak dihitung)")
+        parser.add_argument('--skenario', nargs='+', choices=SKENARIO, default=SKENARIO)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Simpan hasil sebagai JSON untuk dibandingkan sebelum/sesudah")
+
+    def handle(self, *args, **options):
+        self.base_url = options['url'].rstrip('/')
+        self.rng = random.Random(options['seed'])
+        self.siapkan_data(options)
+
+        hasil = []
+        for nama in options['skenario']:
+            persiapan = getattr(self, f'siapkan_{nama}', None)
+            if persiapan:
+                persiapan()
+            buat_request = getattr(self, f'skenario_{nama}')
+            requests = [buat_request(i) for i in range(options['warmup'] + options['requests'])]
+            with ThreadPoolExecutor(max_workers=options['clients']) as executor:
+                list(executor.map(lambda req: self.kirim(*req), requests[:options['warmup']]))
+                mulai = time.perf_counter()
+                responses = list(executor.map(lambda req: self.kirim(*req), requests[options['warmup']:]))
+                durasi = time.perf_counter() - mulai
+            hasil.append(self.ringkas(nama, responses, durasi))
+
+        self.tampilkan(hasil)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({'options': {k: options[k] for k in ('url', 'clients', 'requests', 'seed')},
+                           'hasil': hasil}, file, indent=2)
+            self.stdout.write(f"Hasil disimpan ke {options['output']}")
+
+    def siapkan_data(self, options):
+        """Ambil token dan id fixture dari database yang sama dengan server."""
+        jalur_sales = list(
+            Jalur.objects.filter(users__username__startswith='bench_sales_')
+            .values_list('id', 'users__id', 'users__username')
+            .order_by('id')
+        )
+        if not jalur_sales:
+            raise CommandError("Data benchmark tidak ditemukan, jalankan seed_bakery terlebih dahulu.")
+
+        self.admin_token = self.login('bench_admin', options['password'])
+        tokens = {}
+        self.sales = []
+        for jalur_id, user_id, username in jalur_sales[:max(options['clients'], 1)]:
+            if username not in tokens:
+                tokens[username] = self.login(username, options['password'])
+            self.sales.append({'jalur': jalur_id, 'user': user_id, 'token': tokens[username]})
+
+        self.product_ids = list(
+            Harga.objects.filter(tipe_harga='Harga ke toko', is_delete=False, product__is_delete=False)
+            .values_list('product_id', flat=True)[:500]
+        )
+        self.jalur_ids = [jalur_id for jalur_id, _, _ in jalur_sales]
+        self.pembayaran_terbuka = list(
+            TransaksiPembayaran.objects.exclude(status_pembayaran='lunas').values_list('id', flat=True)[:1000]
+        )
+
+    def login(self, username, password):
+        status, _, _, body = self.kirim('POST', '/auth/token/', {'username': username, 'password': password})
+        if status != 200:
+            raise CommandError(f"Login {username} gagal (HTTP {status}).")
+        return json.loads(body)['access']
+
+    def kirim(self, method, path, data=None, token=None):
+        """Return (status, latency ms, jumlah query, body)."""
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        mulai = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                content = response.read()
+                status, query = response.status, response.headers.get('X-Query-Count')
+        except urllib.error.HTTPError as exc:
+            content = exc.read()
+            status, query = exc.code, exc.headers.get('X-Query-Count')
+        except OSError:
+            content, status, query = b'', 0, None
+        latency = (time.perf_counter() - mulai) * 1000
+        return status, latency, int(query) if query is not None else None, content
+
+    def items_acak(self, jumlah=5):
+        return [
+            {'product': product_id, 'quantity': self.rng.randrange(1, 10), 'tipe_harga': 'Harga ke toko'}
+            for product_id in self.rng.sample(self.product_ids, min(jumlah, len(self.product_ids)))
+        ]
+
+    def skenario_katalog(self, i):
+        return 'GET', '/api/products/', None, self.sales[i % len(self.sales)]['token']
+
+    def skenario_jalur(self, i):
+        return 'GET', '/api/jalur/', None, self.sales[i % len(self.sales)]['token']
+
+    def skenario_riwayat(self, i):
+        return 'GET', f'/api/transaksi-pengambilan/getall?jalur={self.rng.choice(self.jalur_ids)}', None, self.admin_token
+
+    def skenario_pengambilan(self, i):
+        sales = self.sales[i % len(self.sales)]
+        return 'POST', '/api/transaksi-pengambilan/', {'jalur': sales['jalur'], 'items': self.items_acak()}, sales['token']
+
+    def siapkan_update(self):
+        # Update mencari TransaksiPembayaran per (sales, jalur, tanggal) dengan get_or_create;
+        # hanya transaksi yang kombinasinya masih tunggal yang bisa diupdate
+        jumlah_pembayaran = TransaksiPembayaran.objects.filter(
+            user=OuterRef('user'), jalur=OuterRef('jalur'), tanggal_pembayaran=OuterRef('tanggal_pengambilan')
+        ).values('user').annotate(jumlah=Count('id')).values('jumlah')
+        self.transaksi_terbuka = list(
+            TransaksiPengambilan.objects.filter(is_konfirmasi=False, user__username__startswith='bench_sales_')
+            .annotate(jumlah_pembayaran=Subquery(jumlah_pembayaran))
+            .filter(jumlah_pembayaran=1)
+            .values('id', 'user_id', 'jalur_id')[:200]
+        )
+
+    def skenario_update(self, i):
+        if not self.transaksi_terbuka:
+            raise CommandError("Tidak ada transaksi belum dikonfirmasi untuk skenario update.")
+        transaksi = self.transaksi_terbuka[i % len(self.transaksi_terbuka)]
+        items = [dict(item, tipe_item='normal') for item in self.items_acak()]
+        data = {'sales': transaksi['user_id'], 'jalur': transaksi['jalur_id'], 'items': items}
+        return 'PUT', f"/api/transaksi-pengambilan/{transaksi['id']}/", data, self.admin_token
+
+    def skenario_pembayaran(self, i):
+        if not self.pembayaran_terbuka:
+            raise CommandError("Tidak ada pembayaran belum lunas untuk skenario pembayaran.")
+        pembayaran_id = self.pembayaran_terbuka[i % len(self.pembayaran_terbuka)]
+        return 'POST', '/api/transaksi-cicil/', {'pembayaran_id': pembayaran_id, 'jumlah_dibayar': 1000}, self.admin_token
+
+    def ringkas(self, nama, responses, durasi):
+        latencies = sorted(latency for _, latency, _, _ in responses)
+        queries = [query for _, _, query, _ in responses if query is not None]
+        return {
+            'skenario': nama,
+            'requests': len(responses),
+            'error': sum(1 for status, _, _, _ in responses if not 200 <= status < 300),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+            'max_ms': round(latencies[-1], 1) if latencies else 0,
+            'throughput': round(len(responses) / durasi, 1) if durasi else 0,
+            'query_avg': round(sum(queries) / len(queries), 1) if queries else None,
+            'query_max': max(queries) if queries else None,
+        }
+
+    def tampilkan(self, hasil):
+        kolom = ['skenario', 'requests', 'error', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'throughput',
+                 'query_avg', 'query_max']
+        lebar = {k: max(len(k), *(len(str(row[k])) for row in hasil)) for k in kolom}
+        self.stdout.write('  '.join(k.ljust(lebar[k]) for k in kolom))
+        for row in hasil:
+            self.stdout.write('  '.join(str(row[k]).ljust(lebar[k]) for k in kolom))
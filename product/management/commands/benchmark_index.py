@@ -0,0 +1,104 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from product.models import TransaksiPengambilan, TransaksiPembayaran
+from toko.models import Toko, Jalur
+
+# Index dari migrasi 0023 product & 0008 toko yang dibandingkan
+INDEXES = [
+    'pengambilan_keyset_idx',
+    'pengambilan_user_keyset_idx',
+    'pengambilan_jalur_keyset_idx',
+    'pembayaran_user_jalur_tgl_idx',
+    'toko_aktif_jalur_idx',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Bandingkan plan dan latency query utama view dengan dan tanpa index access-pattern. "
+        "Mode tanpa index men-drop index di dalam transaksi yang di-rollback, jadi data dan "
+        "skema tidak berubah. Jalankan setelah seed_bakery (mis. --hari 1100 --transaksi-per-hari 150 "
+        "untuk ~1 juta ItemPengambilan)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ulang', type=int, default=20, help="Jumlah eksekusi per query")
+        parser.add_argument('--plan', action='store_true', help="Tampilkan plan lengkap")
+
+    def handle(self, *args, **options):
+        sampel = self.sampel()
+        queries = self.queries(sampel)
+
+        with_index = self.ukur(queries, options, 'dengan index')
+        with transaction.atomic():
+            # DROP INDEX biasa (bukan schema_editor) agar bisa di-rollback di PostgreSQL & SQLite
+            with connection.cursor() as cursor:
+                for name in INDEXES:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+            tanpa_index = self.ukur(queries, options, 'tanpa index')
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'query':<22}{'tanpa index (ms)':>18}{'dengan index (ms)':>19}{'speedup':>10}")
+        for nama in queries:
+            sebelum, sesudah = tanpa_index[nama]['median_ms'], with_index[nama]['median_ms']
+            speedup = f"{sebelum / sesudah:.1f}x" if sesudah else '-'
+            self.stdout.write(f"{nama:<22}{sebelum:>18.2f}{sesudah:>19.2f}{speedup:>10}")
+            if options['plan']:
+                self.stdout.write(f"  plan tanpa index:\n{self.indent(tanpa_index[nama]['plan'])}")
+                self.stdout.write(f"  plan dengan index:\n{self.indent(with_index[nama]['plan'])}")
+
+    def sampel(self):
+        transaksi = TransaksiPengambilan.objects.order_by('-id').first()
+        pembayaran = TransaksiPembayaran.objects.order_by('-id').first()
+        if transaksi is None or pembayaran is None:
+            raise CommandError("Database kosong, jalankan seed_bakery terlebih dahulu.")
+        return {
+            'user': transaksi.user_id,
+            'jalur': transaksi.jalur_id,
+            'pembayaran': pembayaran,
+            'jalur_ids': list(Jalur.objects.values_list('id', flat=True)[:50]),
+        }
+
+    def queries(self, sampel):
+        """Bentuk query yang dipakai view (lihat komentar index di models)."""
+        pembayaran = sampel['pembayaran']
+        return {
+            'riwayat_admin': TransaksiPengambilan.objects.order_by('-tanggal_pengambilan', '-id')[:51],
+            'riwayat_sales': TransaksiPengambilan.objects.filter(user_id=sampel['user'])
+                             .order_by('-tanggal_pengambilan', '-id')[:51],
+            'riwayat_jalur': TransaksiPengambilan.objects.filter(jalur_id=sampel['jalur'])
+                             .order_by('-tanggal_pengambilan', '-id')[:51],
+            'pembayaran_harian': TransaksiPembayaran.objects.filter(
+                user_id=pembayaran.user_id, jalur_id=pembayaran.jalur_id,
+                tanggal_pembayaran=pembayaran.tanggal_pembayaran,
+            ),
+            'toko_aktif': Toko.objects.filter(jalur_id__in=sampel['jalur_ids'], is_delete=False),
+        }
+
+    def ukur(self, queries, options, label):
+        hasil = {}
+        for nama, queryset in queries.items():
+            durasi = []
+            for _ in range(options['ulang']):
+                mulai = time.perf_counter()
+                list(queryset.all())
+                durasi.append((time.perf_counter() - mulai) * 1000)
+            hasil[nama] = {'median_ms': statistics.median(durasi), 'plan': self.explain(queryset, label)}
+        return hasil
+
+    def explain(self, queryset, label):
+        if connection.vendor == 'postgresql':
+            return queryset.explain(analyze=True, buffers=True)
+        # Statement cache sqlite3 menyimpan plan EXPLAIN lama setelah DROP INDEX,
+        # jadi SQL dibuat berbeda per mode dengan komentar
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN /* {label} */ {sql}", params)
+            return '\n'.join(' '.join(str(kolom) for kolom in row) for row in cursor.fetchall())
+
+    def indent(self, text):
+        return '\n'.join(f"    {line}" for line in text.splitlines())
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum, Count
+
+from product.models import TransaksiPembayaran, RekapPiutang
+
+
+class Command(BaseCommand):
+    help = "Bangun ulang tabel RekapPiutang dari seluruh TransaksiPembayaran."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            RekapPiutang.objects.all().delete()
+            rows = (
+                TransaksiPembayaran.objects.exclude(status_pembayaran='lunas')
+                .filter(kekurangan_bayar__gt=0)
+                .values('user_id', 'jalur_id', 'tanggal_pembayaran')
+                .annotate(sisa=Sum('kekurangan_bayar'), jumlah=Count('id'))
+            )
+            rekap = RekapPiutang.objects.bulk_create([
+                RekapPiutang(
+                    user_id=row['user_id'],
+                    jalur_id=row['jalur_id'],
+                    tanggal=row['tanggal_pembayaran'],
+                    sisa=row['sisa'],
+                    jumlah_transaksi=row['jumlah'],
+                )
+                for row in rows.iterator()
+            ], batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f"{len(rekap)} baris rekap piutang dibuat."))
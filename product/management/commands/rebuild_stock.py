@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, When, Sum, Value
+from django.utils import timezone
+
+from product.catalog import bump_catalog_version
+from product.models import Stock, StockMovement
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang saldo Stock.quantity dari ledger StockMovement."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Tampilkan selisih tanpa menyimpan.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            saldo = {
+                row['product_id']: row['total']
+                for row in StockMovement.objects.values('product_id').annotate(total=Sum('delta'))
+            }
+            stocks = Stock.objects.select_for_update().order_by('product_id')
+            selisih = {
+                stock.pk: saldo.get(stock.pk, 0)
+                for stock in stocks
+                if stock.quantity != saldo.get(stock.pk, 0)
+            }
+
+            for product_id, quantity in selisih.items():
+                self.stdout.write(f"Produk {product_id}: {quantity}")
+
+            if selisih and not options['dry_run']:
+                Stock.objects.filter(product_id__in=selisih.keys()).update(
+                    quantity=Case(
+                        *[When(product_id=product_id, then=Value(quantity))
+                          for product_id, quantity in selisih.items()],
+                    ),
+                    updated_at=timezone.now()
+                )
+                bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(f"{len(selisih)} saldo stok berbeda dari ledger."))
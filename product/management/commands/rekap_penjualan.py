@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from product.laporan import rekonsiliasi_penjualan
+
+
+class Command(BaseCommand):
+    help = (
+        "Rekonsiliasi RekapPenjualanHarian dengan ItemPengambilan terkonfirmasi. "
+        "Default: kemarin dan hari ini (untuk dijalankan tiap malam)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dari', help="Tanggal awal (YYYY-MM-DD)")
+        parser.add_argument('--sampai', help="Tanggal akhir (YYYY-MM-DD)")
+        parser.add_argument('--semua', action='store_true', help="Bangun ulang seluruh riwayat")
+
+    def handle(self, *args, **options):
+        if options['semua']:
+            dari = sampai = None
+        else:
+            hari_ini = timezone.localdate()
+            dari = self._tanggal(options['dari']) if options['dari'] else hari_ini - timedelta(days=1)
+            sampai = self._tanggal(options['sampai']) if options['sampai'] else hari_ini
+            if dari > sampai:
+                raise CommandError("--dari tidak boleh setelah --sampai.")
+
+        jumlah = rekonsiliasi_penjualan(dari, sampai)
+        rentang = "seluruh riwayat" if dari is None else f"{dari} s/d {sampai}"
+        self.stdout.write(self.style.SUCCESS(f"{jumlah} baris rekap penjualan dibuat ({rentang})."))
+
+    def _tanggal(self, value):
+        tanggal = parse_date(value)
+        if tanggal is None:
+            raise CommandError(f"Format tanggal tidak valid: {value}")
+        return tanggal
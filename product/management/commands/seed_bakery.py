@@ -0,0 +1,213 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from BE.cache import bump_version
+from product.catalog import CACHE_NAME as CATALOG_CACHE
+from product.dashboard import CACHE_NAME as DASHBOARD_CACHE
+from product.laporan import rekonsiliasi_penjualan
+from product.models import (Product, Harga, RiwayatHarga, Stock, StockMovement, TransaksiPengambilan,
+                            ItemPengambilan, TransaksiPembayaran, ItemPembayaran, PembayaranEntry)
+from product.pricing import CACHE_NAME as HARGA_CACHE
+from product.services import status_pembayaran
+from toko.models import Jalur, Toko
+
+BATCH_SIZE = 2000
+JENIS_ROTI = ['Tawar', 'Manis', 'Sobek', 'Coklat', 'Keju', 'Pisang', 'Kelapa', 'Pandan', 'Bolu', 'Donat']
+# Selisih harga tiap tipe terhadap harga pabrik
+MARGIN_HARGA = {
+    'Harga pabrik': Decimal('1.00'),
+    'Harga ke pasar': Decimal('1.10'),
+    'Harga di pasar': Decimal('1.25'),
+    'Harga ke toko': Decimal('1.15'),
+    'Harga di toko': Decimal('1.30'),
+    'Harga BS pasar': Decimal('0.50'),
+    'Harga BS toko': Decimal('0.55'),
+    'Harga Ecer': Decimal('1.50'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Isi database lokal (SQLite/Postgres) dengan data toko roti sintetis untuk benchmark: "
+        "produk + 8 tipe harga, jalur & toko, user sales, dan riwayat pengambilan/pembayaran. "
+        "Hasil sama untuk --seed yang sama. Stok dibuat besar dan tidak dikurangi transaksi historis."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--jalur', type=int, default=200)
+        parser.add_argument('--toko-per-jalur', type=int, default=10)
+        parser.add_argument('--sales', type=int, default=40)
+        parser.add_argument('--hari', type=int, default=730, help="Panjang riwayat transaksi (hari)")
+        parser.add_argument('--transaksi-per-hari', type=int, default=30)
+        parser.add_argument('--item-per-transaksi', type=int, default=6)
+        parser.add_argument('--password', default='bench12345', help="Password user bench_admin & bench_sales_*")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--force', action='store_true', help="Tetap jalan walau database sudah berisi produk")
+
+    def handle(self, *args, **options):
+        if Product.objects.exists() and not options['force']:
+            raise CommandError("Database sudah berisi produk. Gunakan --force untuk tetap menambah data.")
+        if options['item_per_transaksi'] > options['products']:
+            raise CommandError("--item-per-transaksi tidak boleh melebihi --products.")
+
+        self.rng = random.Random(options['seed'])
+        with transaction.atomic():
+            sales = self.buat_user(options)
+            harga = self.buat_produk(options)
+            jalur_sales = self.buat_jalur(options, sales)
+            self.buat_transaksi(options, harga, jalur_sales)
+
+        rekonsiliasi_penjualan()
+        call_command('rebuild_rekap_piutang', stdout=self.stdout)
+        for name in (CATALOG_CACHE, HARGA_CACHE, DASHBOARD_CACHE):
+            bump_version(name)
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai. Login: bench_admin / bench_sales_1..{options['sales']} dengan password '{options['password']}'."
+        ))
+
+    def buat_user(self, options):
+        admin_group, _ = Group.objects.get_or_create(name='admin')
+        sales_group, _ = Group.objects.get_or_create(name='sales')
+        password = make_password(options['password'])
+
+        usernames = ['bench_admin'] + [f'bench_sales_{i}' for i in range(1, options['sales'] + 1)]
+        User.objects.bulk_create([User(username=username, password=password) for username in usernames],
+                                 ignore_conflicts=True)
+        users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+        admin_group.user_set.add(users['bench_admin'])
+        sales = [users[username] for username in usernames[1:]]
+        sales_group.user_set.add(*sales)
+        self.stdout.write(f"{len(users)} user.")
+        return sales
+
+    def buat_produk(self, options):
+        products = Product.objects.bulk_create([
+            Product(
+                nama=f"Roti {self.rng.choice(JENIS_ROTI)} {i}",
+                foto_product=f"https://contoh.id/produk/{i}.png",
+            )
+            for i in range(1, options['products'] + 1)
+        ], batch_size=BATCH_SIZE)
+
+        Stock.objects.bulk_create([Stock(product_id=product, quantity=1_000_000) for product in products],
+                                  batch_size=BATCH_SIZE)
+        StockMovement.objects.bulk_create([
+            StockMovement(product=product, delta=1_000_000, reason='saldo_awal') for product in products
+        ], batch_size=BATCH_SIZE)
+
+        harga = {}
+        for product in products:
+            pabrik = Decimal(self.rng.randrange(20, 150) * 100)
+            for tipe, margin in MARGIN_HARGA.items():
+                harga[(product.id, tipe)] = (pabrik * margin).quantize(Decimal('1'))
+        hargas = Harga.objects.bulk_create([
+            Harga(product_id=product_id, tipe_harga=tipe, harga=nilai)
+            for (product_id, tipe), nilai in harga.items()
+        ], batch_size=BATCH_SIZE)
+        RiwayatHarga.objects.bulk_create([
+            RiwayatHarga(product_id=h.product_id, tipe_harga=h.tipe_harga, harga=h.harga, berlaku_mulai=h.created_at)
+            for h in hargas
+        ], batch_size=BATCH_SIZE)
+        self.stdout.write(f"{len(products)} produk, {len(hargas)} harga.")
+        return harga
+
+    def buat_jalur(self, options, sales):
+        jalur = Jalur.objects.bulk_create([
+            Jalur(nama=f"Jalur {i}") for i in range(1, options['jalur'] + 1)
+        ], batch_size=BATCH_SIZE)
+        Toko.objects.bulk_create([
+            Toko(
+                nama=f"Toko {j.id}-{i}",
+                alamat=f"Jl. Contoh No. {i}",
+                koordinat=f"{self.rng.uniform(-8, -6):.6f},{self.rng.uniform(106, 112):.6f}",
+                telepon=f"08{self.rng.randrange(10**9, 10**10)}",
+                is_pasar=self.rng.random() < 0.2,
+                jalur=j,
+            )
+            for j in jalur
+            for i in range(1, options['toko_per_jalur'] + 1)
+        ], batch_size=BATCH_SIZE)
+
+        # Setiap jalur dipegang satu sales, bergiliran
+        Through = Jalur.users.through
+        jalur_sales = [(j, sales[index % len(sales)]) for index, j in enumerate(jalur)]
+        Through.objects.bulk_create([Through(jalur_id=j.id, user_id=s.id) for j, s in jalur_sales],
+                                    batch_size=BATCH_SIZE)
+        self.stdout.write(f"{len(jalur)} jalur, {len(jalur) * options['toko_per_jalur']} toko.")
+        return jalur_sales
+
+    def buat_transaksi(self, options, harga, jalur_sales):
+        product_ids = sorted({product_id for product_id, _ in harga})
+        hari_ini = timezone.localdate()
+        jumlah = 0
+
+        for mundur in range(options['hari'], -1, -1):
+            tanggal = hari_ini - timedelta(days=mundur)
+            dokumen = []
+            # Satu jalur paling banyak satu pengambilan per hari
+            for j, s in self.rng.sample(jalur_sales, min(options['transaksi_per_hari'], len(jalur_sales))):
+                items = []
+                for product_id in self.rng.sample(product_ids, options['item_per_transaksi']):
+                    tipe_item = self.rng.choices(['normal', 'bs', 'retur'], weights=[90, 6, 4])[0]
+                    tipe_harga = self.rng.choice(['Harga ke toko', 'Harga ke pasar', 'Harga di toko'])
+                    quantity = self.rng.randrange(5, 60)
+                    harga_satuan = harga[(product_id, tipe_harga)]
+                    subtotal = harga_satuan * quantity * (1 if tipe_item == 'normal' else -1)
+                    items.append(ItemPengambilan(product_id=product_id, quantity=quantity, harga_satuan=harga_satuan,
+                                                 subtotal=subtotal, tipe_item=tipe_item))
+                dokumen.append((j, s, items))
+
+            self.simpan_hari(tanggal, dokumen, terkonfirmasi=mundur > 0, umur=mundur)
+            jumlah += len(dokumen)
+
+        self.stdout.write(f"{jumlah} transaksi pengambilan.")
+
+    def simpan_hari(self, tanggal, dokumen, terkonfirmasi, umur):
+        transaksi = TransaksiPengambilan.objects.bulk_create([
+            TransaksiPengambilan(user=s, jalur=j, is_konfirmasi=terkonfirmasi,
+                                 total_pengambilan=sum(item.subtotal for item in items))
+            for j, s, items in dokumen
+        ])
+        for t, (_, _, items) in zip(transaksi, dokumen):
+            for item in items:
+                item.transaksi = t
+        items = ItemPengambilan.objects.bulk_create([item for _, _, items in dokumen for item in items],
+                                                    batch_size=BATCH_SIZE)
+
+        pembayaran = []
+        for t in transaksi:
+            # Transaksi lama hampir semua lunas, yang baru masih banyak piutang
+            peluang_lunas = 0.95 if umur > 30 else 0.4
+            if self.rng.random() < peluang_lunas:
+                dibayar = t.total_pengambilan
+            else:
+                dibayar = (t.total_pengambilan * Decimal(self.rng.choice([0, 0.25, 0.5, 0.75]))).quantize(Decimal('1'))
+            pembayaran.append(TransaksiPembayaran(
+                user_id=t.user_id, jalur_id=t.jalur_id, total_pengambilan=t.total_pengambilan,
+                jumlah_dibayar=dibayar, kekurangan_bayar=max(t.total_pengambilan - dibayar, 0),
+                status_pembayaran=status_pembayaran(t.total_pengambilan, dibayar),
+            ))
+        pembayaran = TransaksiPembayaran.objects.bulk_create(pembayaran)
+        PembayaranEntry.objects.bulk_create([
+            PembayaranEntry(transaksi_pembayaran=p, jumlah=p.jumlah_dibayar, jenis='bayar')
+            for p in pembayaran if p.jumlah_dibayar
+        ])
+        pembayaran_per_transaksi = dict(zip((t.id for t in transaksi), pembayaran))
+        ItemPembayaran.objects.bulk_create([
+            ItemPembayaran(transaksi_pembayaran=pembayaran_per_transaksi[item.transaksi_id], item_pengambilan=item,
+                           quantity=item.quantity, harga_satuan=item.harga_satuan, subtotal=item.subtotal)
+            for item in items
+        ], batch_size=BATCH_SIZE)
+
+        # Field auto_now_add selalu diisi hari ini saat insert, tanggal historis ditulis ulang
+        TransaksiPengambilan.objects.filter(pk__in=[t.id for t in transaksi]).update(tanggal_pengambilan=tanggal)
+        TransaksiPembayaran.objects.filter(pk__in=[p.id for p in pembayaran]).update(tanggal_pembayaran=tanggal)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from product.pricing import terapkan_jadwal_harga
+
+
+class Command(BaseCommand):
+    help = (
+        "Samakan Harga.harga dengan harga terjadwal yang sudah berlaku. "
+        "Transaksi sudah memakai harga baru tanpa perintah ini; ini hanya untuk "
+        "tampilan katalog dan bisa dijalankan di luar jam sibuk."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            jumlah = terapkan_jadwal_harga()
+        self.stdout.write(self.style.SUCCESS(f"{jumlah} harga diperbarui."))
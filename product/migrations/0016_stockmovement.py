@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def buat_saldo_awal(apps, schema_editor):
+    Stock = apps.get_model('product', 'Stock')
+    StockMovement = apps.get_model('product', 'StockMovement')
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=stock.pk, delta=stock.quantity, reason='saldo_awal')
+        for stock in Stock.objects.exclude(quantity=0)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0015_itempengambilan_tipe_item_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('saldo_awal', 'Saldo Awal'), ('belanja', 'Belanja'), ('suplier', 'Product In Suplier'), ('pengambilan', 'Pengambilan'), ('penyesuaian', 'Penyesuaian')], max_length=20)),
+                ('source_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'created_at'], name='product_sto_product_1784f7_idx'), models.Index(fields=['reason', 'source_id'], name='product_sto_reason_50d350_idx')],
+            },
+        ),
+        migrations.RunPython(buat_saldo_awal, migrations.RunPython.noop),
+    ]
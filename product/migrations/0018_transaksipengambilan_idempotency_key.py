@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0017_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaksipengambilan',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
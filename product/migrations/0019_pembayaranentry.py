@@ -0,0 +1,37 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def buat_saldo_awal(apps, schema_editor):
+    TransaksiPembayaran = apps.get_model('product', 'TransaksiPembayaran')
+    PembayaranEntry = apps.get_model('product', 'PembayaranEntry')
+    PembayaranEntry.objects.bulk_create([
+        PembayaranEntry(transaksi_pembayaran_id=pembayaran.pk, jumlah=pembayaran.jumlah_dibayar, jenis='saldo_awal')
+        for pembayaran in TransaksiPembayaran.objects.exclude(jumlah_dibayar=0)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0018_transaksipengambilan_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PembayaranEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jumlah', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('jenis', models.CharField(choices=[('saldo_awal', 'Saldo Awal'), ('bayar', 'Bayar'), ('cicil', 'Cicil'), ('pelunasan', 'Pelunasan')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('transaksi_pembayaran', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='product.transaksipembayaran')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(buat_saldo_awal, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def isi_rekap_piutang(apps, schema_editor):
+    from django.db.models import Sum, Count
+    TransaksiPembayaran = apps.get_model('product', 'TransaksiPembayaran')
+    RekapPiutang = apps.get_model('product', 'RekapPiutang')
+    rows = (
+        TransaksiPembayaran.objects.exclude(status_pembayaran='lunas')
+        .filter(kekurangan_bayar__gt=0)
+        .values('user_id', 'jalur_id', 'tanggal_pembayaran')
+        .annotate(sisa=Sum('kekurangan_bayar'), jumlah=Count('id'))
+    )
+    RekapPiutang.objects.bulk_create([
+        RekapPiutang(user_id=row['user_id'], jalur_id=row['jalur_id'], tanggal=row['tanggal_pembayaran'],
+                     sisa=row['sisa'], jumlah_transaksi=row['jumlah'])
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0019_pembayaranentry'),
+        ('toko', '0007_updated_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RekapPiutang',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField()),
+                ('sisa', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('jumlah_transaksi', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('jalur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='toko.jalur')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'jalur', 'tanggal')},
+            },
+        ),
+        migrations.RunPython(isi_rekap_piutang, migrations.RunPython.noop),
+    ]
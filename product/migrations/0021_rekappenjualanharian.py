@@ -0,0 +1,55 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def isi_rekap_penjualan(apps, schema_editor):
+    from django.db.models import Sum
+    ItemPengambilan = apps.get_model('product', 'ItemPengambilan')
+    RekapPenjualanHarian = apps.get_model('product', 'RekapPenjualanHarian')
+    rows = (
+        ItemPengambilan.objects.filter(transaksi__is_konfirmasi=True)
+        .values('transaksi__tanggal_pengambilan', 'product_id', 'transaksi__user_id',
+                'transaksi__jalur_id', 'tipe_item')
+        .annotate(jumlah=Sum('quantity'), nilai=Sum('subtotal'))
+        .order_by()
+    )
+    RekapPenjualanHarian.objects.bulk_create([
+        RekapPenjualanHarian(tanggal=row['transaksi__tanggal_pengambilan'], product_id=row['product_id'],
+                             user_id=row['transaksi__user_id'], jalur_id=row['transaksi__jalur_id'],
+                             tipe_item=row['tipe_item'], quantity=row['jumlah'], subtotal=row['nilai'])
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0020_rekappiutang'),
+        ('toko', '0007_updated_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RekapPenjualanHarian',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField()),
+                ('tipe_item', models.CharField(choices=[('normal', 'Normal'), ('bs', 'Barang Sisa'), ('retur', 'Retur')], max_length=10)),
+                ('quantity', models.IntegerField(default=0)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('jalur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='toko.jalur')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='product.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tanggal'], name='product_rek_tanggal_39df55_idx')],
+                'unique_together': {('tanggal', 'product', 'user', 'jalur', 'tipe_item')},
+            },
+        ),
+        migrations.RunPython(isi_rekap_penjualan, migrations.RunPython.noop),
+    ]
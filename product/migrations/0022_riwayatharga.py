@@ -0,0 +1,41 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def isi_riwayat_harga(apps, schema_editor):
+    # Harga yang ada sekarang dianggap berlaku sejak terakhir diubah
+    Harga = apps.get_model('product', 'Harga')
+    RiwayatHarga = apps.get_model('product', 'RiwayatHarga')
+    RiwayatHarga.objects.bulk_create([
+        RiwayatHarga(product_id=harga.product_id, tipe_harga=harga.tipe_harga,
+                     harga=harga.harga, berlaku_mulai=harga.updated_at)
+        for harga in Harga.objects.all().iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0021_rekappenjualanharian'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiwayatHarga',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipe_harga', models.CharField(choices=[('Harga pabrik', 'Harga pabrik'), ('Harga ke pasar', 'Harga ke pasar'), ('Harga di pasar', 'Harga di pasar'), ('Harga ke toko', 'Harga ke toko'), ('Harga di toko', 'Harga di toko'), ('Harga BS pasar', 'Harga BS pasar'), ('Harga BS toko', 'Harga BS toko'), ('Harga Ecer', 'Harga Ecer')], max_length=20)),
+                ('harga', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('berlaku_mulai', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='riwayat_harga', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['berlaku_mulai'], name='product_riw_berlaku_0844b2_idx')],
+                'unique_together': {('product', 'tipe_harga', 'berlaku_mulai')},
+            },
+        ),
+        migrations.RunPython(isi_riwayat_harga, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0022_riwayatharga'),
+        ('toko', '0008_toko_aktif_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaksipembayaran',
+            index=models.Index(fields=['user', 'jalur', 'tanggal_pembayaran'], name='pembayaran_user_jalur_tgl_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaksipengambilan',
+            index=models.Index(fields=['-tanggal_pengambilan', '-id'], name='pengambilan_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaksipengambilan',
+            index=models.Index(fields=['user', '-tanggal_pengambilan', '-id'], name='pengambilan_user_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaksipengambilan',
+            index=models.Index(fields=['jalur', '-tanggal_pengambilan', '-id'], name='pengambilan_jalur_keyset_idx'),
+        ),
+    ]
@@ -5,7 +5,7 @@ from django.contrib.auth.models import User, Group
 # Create your models here.
 class baseModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         abstract = True 
@@ -36,10 +36,52 @@ class Harga(baseModel):
     class Meta:
         unique_together = ('product', 'tipe_harga')
 
+class RiwayatHarga(models.Model):
+    """
+    Riwayat harga ber-tanggal efektif. Harga yang berlaku pada waktu t adalah
+    baris dengan berlaku_mulai terbesar yang <= t; baris dengan berlaku_mulai
+    di masa depan adalah perubahan harga terjadwal.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='riwayat_harga')
+    tipe_harga = models.CharField(max_length=20, choices=Harga.TIPE_HARGA_CHOICES)
+    harga = models.DecimalField(max_digits=10, decimal_places=2)
+    berlaku_mulai = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # unique_together sekaligus menjadi index lookup harga per tanggal
+        unique_together = ('product', 'tipe_harga', 'berlaku_mulai')
+        indexes = [
+            models.Index(fields=['berlaku_mulai']),
+        ]
+
 class Stock(baseModel):
     quantity = models.IntegerField(default= 0)
     product_id = models.OneToOneField(Product, on_delete= models.CASCADE, primary_key=True)
-    
+
+
+class StockMovement(models.Model):
+    """Ledger perubahan stok (append-only). Stock.quantity = jumlah delta per produk."""
+    REASON_CHOICES = [
+        ('saldo_awal', 'Saldo Awal'),
+        ('belanja', 'Belanja'),
+        ('suplier', 'Product In Suplier'),
+        ('pengambilan', 'Pengambilan'),
+        ('penyesuaian', 'Penyesuaian'),
+    ]
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    # id dokumen sumber sesuai reason (Belanja, ProductInSuplier, TransaksiPengambilan)
+    source_id = models.PositiveBigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'created_at']),
+            models.Index(fields=['reason', 'source_id']),
+        ]
+
     
 class Suplier(baseModel):
     pt = models.CharField(max_length= 20)
@@ -76,6 +118,17 @@ class TransaksiPengambilan(baseModel):
     tanggal_pengambilan = models.DateField(auto_now_add=True)
     total_pengambilan = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     is_konfirmasi = models.BooleanField(default=False)
+    # Key unik dari device sales, supaya kiriman ulang tidak membuat transaksi ganda
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    class Meta:
+        # Keyset pagination riwayat: ORDER BY tanggal_pengambilan DESC, id DESC,
+        # biasanya difilter per sales atau per jalur
+        indexes = [
+            models.Index(fields=['-tanggal_pengambilan', '-id'], name='pengambilan_keyset_idx'),
+            models.Index(fields=['user', '-tanggal_pengambilan', '-id'], name='pengambilan_user_keyset_idx'),
+            models.Index(fields=['jalur', '-tanggal_pengambilan', '-id'], name='pengambilan_jalur_keyset_idx'),
+        ]
 
 class ItemPengambilan(models.Model):
     TIPE_ITEM_CHOICES = [
@@ -118,6 +171,64 @@ class TransaksiPembayaran(models.Model):
     def __str__(self):
         return f"Pembayaran {self.id} - {self.user.username}"
 
+    class Meta:
+        indexes = [
+            # get_or_create di TransaksiPengambilanUpdateSerializer.update
+            models.Index(fields=['user', 'jalur', 'tanggal_pembayaran'], name='pembayaran_user_jalur_tgl_idx'),
+        ]
+
+
+class PembayaranEntry(models.Model):
+    """Ledger pembayaran (append-only). jumlah_dibayar = total jumlah semua entry."""
+    JENIS_CHOICES = [
+        ('saldo_awal', 'Saldo Awal'),
+        ('bayar', 'Bayar'),
+        ('cicil', 'Cicil'),
+        ('pelunasan', 'Pelunasan'),
+    ]
+    transaksi_pembayaran = models.ForeignKey(TransaksiPembayaran, related_name='entries', on_delete=models.CASCADE)
+    jumlah = models.DecimalField(max_digits=12, decimal_places=2)
+    jenis = models.CharField(max_length=20, choices=JENIS_CHOICES)
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class RekapPiutang(models.Model):
+    """
+    Ringkasan piutang per (sales, jalur, tanggal_pembayaran), diperbarui secara
+    inkremental setiap kali pembayaran / pengambilan berubah.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    jalur = models.ForeignKey(Jalur, on_delete=models.CASCADE)
+    tanggal = models.DateField()
+    sisa = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    jumlah_transaksi = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'jalur', 'tanggal')
+
+
+class RekapPenjualanHarian(models.Model):
+    """
+    Rollup harian ItemPengambilan yang sudah dikonfirmasi per produk, sales,
+    jalur dan tipe_item. subtotal mengikuti tanda ItemPengambilan (bs/retur negatif).
+    """
+    tanggal = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    jalur = models.ForeignKey(Jalur, on_delete=models.CASCADE)
+    tipe_item = models.CharField(max_length=10, choices=ItemPengambilan.TIPE_ITEM_CHOICES)
+    quantity = models.IntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('tanggal', 'product', 'user', 'jalur', 'tipe_item')
+        indexes = [
+            models.Index(fields=['tanggal']),
+        ]
+
 
 class ItemPembayaran(models.Model):
     transaksi_pembayaran = models.ForeignKey(TransaksiPembayaran, related_name='items', on_delete=models.CASCADE)
@@ -0,0 +1,74 @@
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor (keyset) pagination dengan urutan (-date_field, -id).
+
+    Cursor berisi (tanggal, id) baris terakhir pada halaman sebelumnya, sehingga
+    setiap halaman cukup memakai WHERE (tanggal, id) < (cursor) tanpa OFFSET.
+    """
+    date_field = 'tanggal_pengambilan'
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: "page_size harus berupa angka."})
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, obj):
+        raw = f"{getattr(obj, self.date_field).isoformat()}|{obj.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            tanggal, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            tanggal = parse_date(tanggal)
+            pk = int(pk)
+        except (ValueError, UnicodeDecodeError):
+            tanggal = None
+        if tanggal is None:
+            raise ValidationError({self.cursor_query_param: "Cursor tidak valid."})
+        return tanggal, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            tanggal, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(**{f'{self.date_field}__lt': tanggal}) |
+                Q(**{self.date_field: tanggal, 'pk__lt': pk})
+            )
+
+        rows = list(queryset.order_by(f'-{self.date_field}', '-pk')[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_cursor = self.encode_cursor(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
@@ -0,0 +1,212 @@
+"""
+Cache tabel harga (product_id, tipe_harga) -> jadwal harga.
+
+Dua tingkat: salinan in-process per worker dan salinan di cache bersama
+(Django cache), keduanya dikunci nomor versi dari BE.cache. Setiap perubahan
+Harga / RiwayatHarga menaikkan versi, sehingga semua worker memuat ulang
+tabel pada pembacaan berikutnya (syarat: CACHES memakai backend bersama).
+
+Jadwal berisi harga yang berlaku saat tabel dimuat diikuti perubahan
+terjadwal, sehingga pergantian harga pada berlaku_mulai tidak butuh write
+maupun reload.
+"""
+import threading
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from BE import metrics
+from BE.cache import get_version, bump_version
+from .catalog import bump_catalog_version
+from .models import Harga, RiwayatHarga
+
+CACHE_NAME = 'harga'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+_lock = threading.Lock()
+_local = {'version': None, 'table': None}
+
+
+def _harga_aktif(waktu):
+    """Harga aktif dianotasi dengan harga riwayat yang berlaku pada waktu tertentu."""
+    riwayat = RiwayatHarga.objects.filter(
+        product=OuterRef('product'),
+        tipe_harga=OuterRef('tipe_harga'),
+        berlaku_mulai__lte=waktu,
+    ).order_by('-berlaku_mulai')
+    return Harga.objects.filter(is_delete=False).annotate(
+        harga_berlaku=Subquery(riwayat.values('harga')[:1]),
+        berlaku_sejak=Subquery(riwayat.values('berlaku_mulai')[:1]),
+    )
+
+
+def _load_table():
+    sekarang = timezone.now()
+    table = {}
+    for product_id, tipe_harga, harga, harga_berlaku, berlaku_sejak in _harga_aktif(sekarang).values_list(
+        'product_id', 'tipe_harga', 'harga', 'harga_berlaku', 'berlaku_sejak'
+    ):
+        # Tanpa riwayat: harga di tabel Harga dianggap berlaku untuk semua waktu
+        if harga_berlaku is None:
+            table[(product_id, tipe_harga)] = [(None, harga)]
+        else:
+            table[(product_id, tipe_harga)] = [(berlaku_sejak, harga_berlaku)]
+
+    terjadwal = RiwayatHarga.objects.filter(berlaku_mulai__gt=sekarang).order_by('berlaku_mulai')
+    for product_id, tipe_harga, harga, berlaku_mulai in terjadwal.values_list(
+        'product_id', 'tipe_harga', 'harga', 'berlaku_mulai'
+    ):
+        jadwal = table.get((product_id, tipe_harga))
+        if jadwal is not None:
+            jadwal.append((berlaku_mulai, harga))
+    return table
+
+
+def get_price_table():
+    """Tabel harga untuk versi terbaru; dimuat dengan dua query saat miss."""
+    version = get_version(CACHE_NAME)
+    with _lock:
+        if _local['version'] == version:
+            metrics.incr('harga.cache.hit')
+            return _local['table']
+
+    key = f'{CACHE_NAME}:{version}'
+    table = cache.get(key)
+    if table is None:
+        metrics.incr('harga.cache.miss')
+        table = _load_table()
+        cache.set(key, table, CACHE_TIMEOUT)
+    else:
+        metrics.incr('harga.cache.hit.shared')
+
+    with _lock:
+        _local['version'] = version
+        _local['table'] = table
+    return table
+
+
+def harga_pada(product_id, tipe_harga, waktu):
+    """Harga dari riwayat yang berlaku pada waktu tertentu (satu lookup index)."""
+    return RiwayatHarga.objects.filter(
+        product_id=product_id,
+        tipe_harga=tipe_harga,
+        berlaku_mulai__lte=waktu,
+    ).order_by('-berlaku_mulai').values_list('harga', flat=True).first()
+
+
+def harga_berlaku(table, product_id, tipe_harga, waktu=None):
+    """
+    Harga satuan dari tabel harga pada waktu tertentu (default sekarang), atau
+    None jika produk tidak punya tipe harga aktif tersebut. Waktu sebelum
+    jadwal di tabel dilayani dari riwayat di database.
+    """
+    jadwal = table.get((product_id, tipe_harga))
+    if jadwal is None:
+        return None
+    waktu = waktu or timezone.now()
+    berlaku_sejak, harga = jadwal[0]
+    if berlaku_sejak is not None and waktu < berlaku_sejak:
+        return harga_pada(product_id, tipe_harga, waktu)
+    for berlaku_mulai, nilai in jadwal[1:]:
+        if berlaku_mulai > waktu:
+            break
+        harga = nilai
+    return harga
+
+
+def get_harga(product_id, tipe_harga, waktu=None):
+    return harga_berlaku(get_price_table(), product_id, tipe_harga, waktu)
+
+
+def invalidate_harga():
+    """Naikkan versi tabel harga setelah transaksi yang sedang berjalan commit."""
+    transaction.on_commit(lambda: bump_version(CACHE_NAME))
+
+
+def catat_riwayat_harga(harga):
+    """Simpan perubahan langsung pada Harga sebagai riwayat yang berlaku mulai sekarang."""
+    if harga.is_delete:
+        return
+    sekarang = timezone.now()
+    nilai = Decimal(str(harga.harga))
+    if harga_pada(harga.product_id, harga.tipe_harga, sekarang) != nilai:
+        RiwayatHarga.objects.create(
+            product_id=harga.product_id,
+            tipe_harga=harga.tipe_harga,
+            harga=nilai,
+            berlaku_mulai=sekarang,
+        )
+
+
+def terapkan_jadwal_harga():
+    """
+    Samakan kolom Harga.harga dengan harga yang berlaku saat ini menurut
+    riwayat (dipakai katalog). Aman dijalankan kapan saja di luar jam sibuk;
+    transaksi sudah memakai harga terjadwal tanpa langkah ini.
+    """
+    sekarang = timezone.now()
+    berubah = []
+    for harga in _harga_aktif(sekarang).exclude(harga_berlaku=None):
+        if harga.harga != harga.harga_berlaku:
+            harga.harga = harga.harga_berlaku
+            # bulk_update tidak mengisi auto_now, padahal sync delta membaca updated_at
+            harga.updated_at = sekarang
+            berubah.append(harga)
+    if berubah:
+        Harga.objects.bulk_update(berubah, ['harga', 'updated_at'], batch_size=500)
+        invalidate_harga()
+        bump_catalog_version()
+    return len(berubah)
+
+
+def simpan_harga_massal(perubahan, berlaku_mulai=None):
+    """
+    Terapkan daftar perubahan harga (hasil HargaBulkSerializer.perubahan())
+    dalam satu transaksi: bulk_update harga yang sudah ada, bulk_create yang
+    baru, dan catat riwayatnya. Jika berlaku_mulai diisi, perubahan hanya
+    dijadwalkan di RiwayatHarga tanpa menyentuh tabel Harga.
+    """
+    sekarang = timezone.now()
+    with transaction.atomic():
+        if berlaku_mulai is None:
+            existing = Harga.objects.select_for_update().in_bulk(
+                [row['id'] for row in perubahan if row['id'] is not None]
+            )
+            diubah, baru = [], []
+            for row in perubahan:
+                if row['id'] is None:
+                    baru.append(Harga(product_id=row['product'], tipe_harga=row['tipe_harga'], harga=row['harga_baru']))
+                else:
+                    harga = existing[row['id']]
+                    harga.harga = row['harga_baru']
+                    harga.is_delete = False
+                    harga.updated_at = sekarang
+                    diubah.append(harga)
+            Harga.objects.bulk_update(diubah, ['harga', 'is_delete', 'updated_at'], batch_size=500)
+            Harga.objects.bulk_create(baru, batch_size=500)
+            bump_catalog_version()
+
+        # bulk_update / bulk_create tidak memicu signal, riwayat ditulis langsung
+        RiwayatHarga.objects.bulk_create([
+            RiwayatHarga(
+                product_id=row['product'],
+                tipe_harga=row['tipe_harga'],
+                harga=row['harga_baru'],
+                berlaku_mulai=berlaku_mulai or sekarang,
+            )
+            for row in perubahan
+        ], batch_size=500)
+        invalidate_harga()
+    return len(perubahan)
+
+
+def cache_stats():
+    return {
+        'version': get_version(CACHE_NAME),
+        'hit': metrics.get('harga.cache.hit'),
+        'hit_shared': metrics.get('harga.cache.hit.shared'),
+        'miss': metrics.get('harga.cache.miss'),
+    }
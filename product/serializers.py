@@ -2,10 +2,14 @@ from rest_framework import serializers
 from .models import (Product, Harga, Stock, Suplier, 
                     ProductInSuplier, Belanja, ItemBelanja,
                     ItemPengambilan, TransaksiPengambilan,
-                    ItemPembayaran, TransaksiPembayaran)
+                    ItemPembayaran, TransaksiPembayaran, RiwayatHarga)
 from toko.models import Jalur
-from django.db import transaction
+from .services import atomic_with_retry, ensure_stocks, lock_stocks, apply_stock_deltas, apply_payment, sync_pembayaran
+from .laporan import nilai_piutang, catat_perubahan_piutang
+from .pricing import get_price_table, harga_berlaku
 from django.contrib.auth.models import User
+from django.utils import timezone
+from decimal import Decimal, ROUND_HALF_UP
 
 
 class HargaSerializer(serializers.ModelSerializer):
@@ -14,6 +18,8 @@ class HargaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Harga
         fields = ['id', 'tipe_harga', 'harga', 'product', 'product_nama']
+        # Keunikan dicek di validate (baris yang di-soft delete boleh dipakai lagi)
+        validators = []
         
     def validate(self, attrs):
         tipe_harga = attrs['tipe_harga']
@@ -24,17 +30,150 @@ class HargaSerializer(serializers.ModelSerializer):
 
         if self.instance:
             existing_qs = existing_qs.exclude(id=self.instance.id)
+        else:
+            # Harga yang sudah di-soft delete dipakai lagi oleh create
+            existing_qs = existing_qs.filter(is_delete=False)
 
         if existing_qs.exists():
             raise serializers.ValidationError(f"Tipe harga '{tipe_harga}' sudah ada untuk produk ini.")
 
         return attrs
 
+    def create(self, validated_data):
+        harga = Harga.objects.filter(product=validated_data['product'], tipe_harga=validated_data['tipe_harga'],
+                                     is_delete=True).first()
+        if harga is None:
+            return super().create(validated_data)
+        harga.harga = validated_data['harga']
+        harga.is_delete = False
+        harga.save()
+        return harga
+
         
 class HargaProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Harga
         fields = ['id', 'tipe_harga', 'harga']
+
+
+class ItemHargaBulkSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    tipe_harga = serializers.ChoiceField(choices=Harga.TIPE_HARGA_CHOICES)
+    harga = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+
+
+class HargaBulkSerializer(serializers.Serializer):
+    """
+    Ubah banyak harga sekaligus, dengan daftar `items` (upsert per product &
+    tipe_harga) atau aturan `persen` untuk satu `tipe_harga` di semua produk.
+    """
+    items = ItemHargaBulkSerializer(many=True, required=False, allow_empty=False)
+    tipe_harga = serializers.ChoiceField(choices=Harga.TIPE_HARGA_CHOICES, required=False)
+    persen = serializers.DecimalField(max_digits=6, decimal_places=2, required=False, min_value=-99)
+    pembulatan = serializers.IntegerField(required=False, min_value=1,
+                                          help_text="Bulatkan hasil aturan persen ke kelipatan ini")
+    berlaku_mulai = serializers.DateTimeField(required=False,
+                                              help_text="Jadwalkan perubahan alih-alih langsung diterapkan")
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate_berlaku_mulai(self, value):
+        if value <= timezone.now():
+            raise serializers.ValidationError("Perubahan harga hanya bisa dijadwalkan untuk waktu yang akan datang.")
+        return value
+
+    def validate(self, attrs):
+        items = attrs.get('items')
+        if bool(items) == ('persen' in attrs):
+            raise serializers.ValidationError("Isi salah satu: items atau persen.")
+        if 'persen' in attrs and 'tipe_harga' not in attrs:
+            raise serializers.ValidationError("tipe_harga wajib diisi untuk aturan persen.")
+
+        if items:
+            pasangan = [(item['product'], item['tipe_harga']) for item in items]
+            if len(set(pasangan)) != len(pasangan):
+                raise serializers.ValidationError("Kombinasi product dan tipe_harga tidak boleh duplikat.")
+            product_ids = {item['product'] for item in items}
+            ditemukan = set(Product.objects.filter(pk__in=product_ids, is_delete=False).values_list('pk', flat=True))
+            if product_ids - ditemukan:
+                raise serializers.ValidationError(
+                    f"Produk tidak ditemukan: {', '.join(map(str, sorted(product_ids - ditemukan)))}"
+                )
+        return attrs
+
+    def perubahan(self):
+        """Diff harga lama -> baru; hanya baris yang nilainya berubah."""
+        data = self.validated_data
+        hasil = []
+        if data.get('items'):
+            items = data['items']
+            existing = {
+                (harga.product_id, harga.tipe_harga): harga
+                for harga in Harga.objects.select_related('product').filter(
+                    product_id__in={item['product'] for item in items},
+                    tipe_harga__in={item['tipe_harga'] for item in items},
+                )
+            }
+            nama = dict(Product.objects.filter(pk__in={item['product'] for item in items}).values_list('pk', 'nama'))
+            for item in items:
+                harga = existing.get((item['product'], item['tipe_harga']))
+                if harga is None and data.get('berlaku_mulai'):
+                    raise serializers.ValidationError(
+                        f"Tipe harga '{item['tipe_harga']}' belum ada untuk produk '{nama[item['product']]}'."
+                    )
+                harga_lama = harga.harga if harga and not harga.is_delete else None
+                if harga_lama == item['harga']:
+                    continue
+                hasil.append({
+                    'id': harga.id if harga else None,
+                    'product': item['product'],
+                    'product_nama': nama[item['product']],
+                    'tipe_harga': item['tipe_harga'],
+                    'harga_lama': harga_lama,
+                    'harga_baru': item['harga'],
+                })
+        else:
+            faktor = 1 + data['persen'] / 100
+            pembulatan = data.get('pembulatan')
+            hargas = Harga.objects.select_related('product').filter(
+                tipe_harga=data['tipe_harga'], is_delete=False, product__is_delete=False
+            ).order_by('product_id')
+            for harga in hargas:
+                harga_baru = harga.harga * faktor
+                if pembulatan:
+                    harga_baru = (harga_baru / pembulatan).quantize(Decimal('1'), rounding=ROUND_HALF_UP) * pembulatan
+                harga_baru = harga_baru.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+                if harga_baru == harga.harga:
+                    continue
+                hasil.append({
+                    'id': harga.id,
+                    'product': harga.product_id,
+                    'product_nama': harga.product.nama,
+                    'tipe_harga': harga.tipe_harga,
+                    'harga_lama': harga.harga,
+                    'harga_baru': harga_baru,
+                })
+        return hasil
+
+
+class RiwayatHargaSerializer(serializers.ModelSerializer):
+    product_nama = serializers.CharField(source='product.nama', read_only=True)
+
+    class Meta:
+        model = RiwayatHarga
+        fields = ['id', 'product', 'product_nama', 'tipe_harga', 'harga', 'berlaku_mulai', 'created_at']
+        read_only_fields = ['created_at']
+
+    def validate_berlaku_mulai(self, value):
+        if value <= timezone.now():
+            raise serializers.ValidationError("Perubahan harga hanya bisa dijadwalkan untuk waktu yang akan datang.")
+        return value
+
+    def validate(self, attrs):
+        if not Harga.objects.filter(product=attrs['product'], tipe_harga=attrs['tipe_harga'], is_delete=False).exists():
+            raise serializers.ValidationError(
+                f"Tipe harga '{attrs['tipe_harga']}' belum ada untuk produk '{attrs['product'].nama}'."
+            )
+        return attrs
         
 class StockSerializer(serializers.ModelSerializer):
     product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
@@ -42,6 +181,23 @@ class StockSerializer(serializers.ModelSerializer):
     class Meta:
         model = Stock
         fields = ['product_id', 'quantity']
+
+    @atomic_with_retry
+    def create(self, validated_data):
+        product = validated_data['product_id']
+        stock = Stock.objects.create(product_id=product, quantity=0)
+        apply_stock_deltas({product.id: validated_data.get('quantity', 0)}, 'penyesuaian')
+        stock.refresh_from_db()
+        return stock
+
+    @atomic_with_retry
+    def update(self, instance, validated_data):
+        # Set stok manual dicatat sebagai penyesuaian sebesar selisihnya
+        stock = lock_stocks([instance.pk])[instance.pk]
+        quantity = validated_data.get('quantity', stock.quantity)
+        apply_stock_deltas({stock.pk: quantity - stock.quantity}, 'penyesuaian')
+        instance.refresh_from_db()
+        return instance
         
 class SuplierSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(read_only=True)
@@ -85,6 +241,13 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = ['id', 'nama', 'foto_product', 'harga_list', 'stock']
 
+    def __init__(self, *args, fields=None, **kwargs):
+        # Sparse fields (?fields=): buang field yang tidak diminta client
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     def validate_harga_list(self, value):
         if not value:
             raise serializers.ValidationError("Minimal harus ada satu harga.")
@@ -127,21 +290,23 @@ class ProductInSuplierSerializer(serializers.ModelSerializer):
         model = ProductInSuplier
         fields = ['id', 'product', 'product_id', 'suplier', 'suplier_id', 'jumlah_belanja', 'quantity', 'tanggal_belanja']
         
+    @atomic_with_retry
     def create(self, validated_data):
         product_in_suplier = ProductInSuplier.objects.create(**validated_data)
-        product = product_in_suplier.product
-        try:
-            stock = Stock.objects.get(product_id=product)
-        except Stock.DoesNotExist:
-            stock = Stock.objects.create(product_id=product, quantity=0)
+        product_id = product_in_suplier.product_id
 
-        stock.quantity += product_in_suplier.quantity
-        stock.save()
+        ensure_stocks([product_id])
+        lock_stocks([product_id])
+        apply_stock_deltas({product_id: product_in_suplier.quantity}, 'suplier', product_in_suplier.id)
 
         return product_in_suplier
     
 
 class ItemBelanjaSerializer(serializers.ModelSerializer):
+    # id opsional: dipakai BelanjaSerializer.update untuk mencocokkan item lama
+    id = serializers.IntegerField(required=False)
+    # Produk di-resolve sekaligus di BelanjaSerializer.validate_items
+    product = serializers.IntegerField(source='product_id')
     product_nama = serializers.CharField(source='product.nama', read_only=True)
 
     class Meta:
@@ -149,6 +314,11 @@ class ItemBelanjaSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'product_nama', 'jumlah_belanja', 'quantity']
 
 
+def buat_item_belanja(belanja, item_data):
+    return ItemBelanja(belanja=belanja, product=item_data['product'],
+                       jumlah_belanja=item_data['jumlah_belanja'], quantity=item_data['quantity'])
+
+
 class BelanjaSerializer(serializers.ModelSerializer):
     items = ItemBelanjaSerializer(many=True)
 
@@ -156,6 +326,16 @@ class BelanjaSerializer(serializers.ModelSerializer):
         model = Belanja
         fields = ['id', 'suplier', 'total_belanja','tanggal_belanja', 'items']
         
+    def validate_items(self, items):
+        products = Product.objects.in_bulk({item['product_id'] for item in items})
+        for item in items:
+            product_id = item.pop('product_id')
+            product = products.get(product_id)
+            if product is None:
+                raise serializers.ValidationError(f"Produk dengan id {product_id} tidak ditemukan.")
+            item['product'] = product
+        return items
+
     def validate(self, data):
         items = data.get('items', [])
         total_dari_items = sum([item['jumlah_belanja'] for item in items])
@@ -164,50 +344,94 @@ class BelanjaSerializer(serializers.ModelSerializer):
         return data
 
 
+    @atomic_with_retry
     def create(self, validated_data):
-        items_data = validated_data.pop('items')
-        belanja = Belanja.objects.create(**validated_data)
+        # validated_data tidak diubah supaya atomic_with_retry bisa mengulang dengan data yang sama
+        items_data = validated_data['items']
+        belanja = Belanja.objects.create(**{key: value for key, value in validated_data.items() if key != 'items'})
 
+        deltas = {}
         for item in items_data:
-            item_obj = ItemBelanja.objects.create(belanja=belanja, **item)
+            product_id = item['product'].id
+            deltas[product_id] = deltas.get(product_id, 0) + item['quantity']
+        ItemBelanja.objects.bulk_create([buat_item_belanja(belanja, item) for item in items_data])
 
-            product = item['product']
-            stock, _ = Stock.objects.get_or_create(product_id=product)
-            stock.quantity += item['quantity']
-            stock.save()
+        ensure_stocks(deltas.keys())
+        lock_stocks(deltas.keys())
+        apply_stock_deltas(deltas, 'belanja', belanja.id)
 
         return belanja
 
+    @atomic_with_retry
     def update(self, instance, validated_data):
-        items_data = validated_data.pop('items')
+        items_data = validated_data['items']
 
         instance.suplier = validated_data.get('suplier', instance.suplier)
         instance.tanggal_belanja = validated_data.get('tanggal_belanja', instance.tanggal_belanja)
         instance.total_belanja = validated_data.get('total_belanja', instance.total_belanja)
         instance.save()
 
-        # 1. Revert stock quantity dari item lama
-        for item in instance.items.all():
-            stock = Stock.objects.filter(product_id=item.product).first()
-            if stock:
-                stock.quantity -= item.quantity
-                stock.save()
-
-        # 2. Delete all old item belanja
-        instance.items.all().delete()
+        old_items = {item.id: item for item in instance.items.all()}
+        deltas = {}
+        for item in old_items.values():
+            deltas[item.product_id] = deltas.get(item.product_id, 0) - item.quantity
 
-        # 3. Create item baru dan update stock-nya
+        # 1. Cocokkan item request dengan item lama: berdasarkan id bila dikirim,
+        #    selain itu item lama pertama dengan produk yang sama
+        matched = {}
+        unmatched = []
         for item_data in items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
-
-            # Create ItemBelanja baru
-            ItemBelanja.objects.create(belanja=instance, **item_data)
+            item_id = item_data.get('id')
+            if item_id is not None:
+                if item_id not in old_items or item_id in matched:
+                    raise serializers.ValidationError(f"Item belanja dengan id {item_id} tidak ditemukan.")
+                matched[item_id] = item_data
+            else:
+                unmatched.append(item_data)
+
+        sisa_per_product = {}
+        for item in old_items.values():
+            if item.id not in matched:
+                sisa_per_product.setdefault(item.product_id, []).append(item)
+
+        to_create = []
+        for item_data in unmatched:
+            sisa = sisa_per_product.get(item_data['product'].id)
+            if sisa:
+                matched[sisa.pop(0).id] = item_data
+            else:
+                to_create.append(buat_item_belanja(instance, item_data))
+
+        # 2. Hanya baris yang berubah yang ditulis
+        to_update = []
+        for item_id, item_data in matched.items():
+            item = old_items[item_id]
+            if (item.product_id, item.jumlah_belanja, item.quantity) != (
+                    item_data['product'].id, item_data['jumlah_belanja'], item_data['quantity']):
+                item.product = item_data['product']
+                item.jumlah_belanja = item_data['jumlah_belanja']
+                item.quantity = item_data['quantity']
+                to_update.append(item)
+
+        to_delete = [item_id for item_id in old_items if item_id not in matched]
+
+        if to_delete:
+            ItemBelanja.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            ItemBelanja.objects.bulk_update(to_update, ['product', 'jumlah_belanja', 'quantity'])
+        if to_create:
+            ItemBelanja.objects.bulk_create(to_create)
+
+        # 3. Stok cukup disesuaikan sebesar selisih bersih per produk
+        for item_data in items_data:
+            product_id = item_data['product'].id
+            deltas[product_id] = deltas.get(product_id, 0) + item_data['quantity']
+        deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
 
-            # Tambahkan quantity ke Stock
-            stock, created = Stock.objects.get_or_create(product_id=product)
-            stock.quantity += quantity
-            stock.save()
+        if deltas:
+            ensure_stocks(deltas.keys())
+            lock_stocks(deltas.keys())
+            apply_stock_deltas(deltas, 'belanja', instance.id)
 
         return instance
 
@@ -230,6 +454,8 @@ class TransaksiPengambilanDetailSerializer(serializers.ModelSerializer):
 
 
 class ItemPengambilanCreateSerializer(serializers.ModelSerializer):
+    # Produk di-resolve sekaligus di TransaksiPengambilanSerializer.validate_items
+    product = serializers.IntegerField()
     tipe_harga = serializers.CharField()
     
     class Meta:
@@ -240,78 +466,109 @@ class TransaksiPengambilanSerializer(serializers.Serializer):
     # sales = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
     jalur = serializers.PrimaryKeyRelatedField(queryset=Jalur.objects.all())
     items = ItemPengambilanCreateSerializer(many=True)
+    idempotency_key = serializers.CharField(max_length=64, required=False)
 
     def validate_sales(self, sales_user):
         if not sales_user.groups.filter(name='sales').exists():
             raise serializers.ValidationError("User yang dipilih bukan sales.")
         return sales_user
 
+    def validate_items(self, items):
+        products = Product.objects.in_bulk({item['product'] for item in items})
+        for item in items:
+            product = products.get(item['product'])
+            if product is None:
+                raise serializers.ValidationError(f"Produk dengan id {item['product']} tidak ditemukan.")
+            item['product'] = product
+        return items
+
+    @atomic_with_retry
     def create(self, validated_data):
         request = self.context.get('request')
         sales = request.user
         jalur = validated_data['jalur']
         items_data = validated_data['items']
 
-        with transaction.atomic():
-            transaksi = TransaksiPengambilan.objects.create(user=sales, jalur=jalur)
-            total = 0
-
-            for item_data in items_data:
-                product = item_data['product']
-                quantity = item_data['quantity']
-                tipe_harga = item_data['tipe_harga']
-
-                try:
-                    stock = Stock.objects.select_for_update().get(product_id=product)
-                except Stock.DoesNotExist:
-                    raise serializers.ValidationError(f"Stok untuk produk '{product.nama}' tidak ditemukan.")
-
-                if stock.quantity < quantity:
-                    raise serializers.ValidationError(f"Stok tidak mencukupi untuk produk '{product.nama}'. Sisa stok: {stock.quantity}")
-
-                harga = Harga.objects.filter(
-                    product=product,
-                    tipe_harga=tipe_harga,
-                    is_delete=False
-                ).order_by('tipe_harga').first()
+        # Total kebutuhan per produk (satu produk bisa muncul di beberapa baris)
+        kebutuhan = {}
+        products = {}
+        for item_data in items_data:
+            product = item_data['product']
+            products[product.id] = product
+            kebutuhan[product.id] = kebutuhan.get(product.id, 0) + item_data['quantity']
 
-                harga_satuan = harga.harga if harga else 0
-                subtotal = harga_satuan * quantity
+        # Kunci semua stok sekaligus, urut product id
+        stocks = lock_stocks(kebutuhan.keys())
 
-                item_pengambilan = ItemPengambilan.objects.create(
-                    transaksi=transaksi,
-                    product=product,
-                    quantity=quantity,
-                    harga_satuan=harga_satuan,
-                    subtotal=subtotal
-                )
+        for product_id, quantity in kebutuhan.items():
+            stock = stocks.get(product_id)
+            if stock is None:
+                raise serializers.ValidationError(f"Stok untuk produk '{products[product_id].nama}' tidak ditemukan.")
+            if stock.quantity < quantity:
+                raise serializers.ValidationError(f"Stok tidak mencukupi untuk produk '{products[product_id].nama}'. Sisa stok: {stock.quantity}")
 
-                stock.quantity -= quantity
-                stock.save()
+        harga_map = get_price_table()
+        waktu = timezone.now()
 
-                total += subtotal
+        items = []
+        total = 0
+        for item_data in items_data:
+            product = item_data['product']
+            quantity = item_data['quantity']
+            harga_satuan = harga_berlaku(harga_map, product.id, item_data['tipe_harga'], waktu) or 0
+            subtotal = harga_satuan * quantity
+            items.append(ItemPengambilan(
+                product=product,
+                quantity=quantity,
+                harga_satuan=harga_satuan,
+                subtotal=subtotal
+            ))
+            total += subtotal
+
+        transaksi = TransaksiPengambilan.objects.create(
+            user=sales,
+            jalur=jalur,
+            total_pengambilan=total,
+            idempotency_key=validated_data.get('idempotency_key')
+        )
+        for item in items:
+            item.transaksi = transaksi
+        ItemPengambilan.objects.bulk_create(items)
+
+        # Kurangi stok dengan satu UPDATE
+        apply_stock_deltas({product_id: -quantity for product_id, quantity in kebutuhan.items()}, 'pengambilan', transaksi.id)
+
+        transaksi_pembayaran = TransaksiPembayaran.objects.create(
+            user=sales,
+            jalur=jalur,
+            total_pengambilan=total,
+            jumlah_dibayar=0,
+            status_pembayaran='belum dibayar'
+        )
+        catat_perubahan_piutang(transaksi_pembayaran, 0)
+
+        ItemPembayaran.objects.bulk_create([
+            ItemPembayaran(
+                transaksi_pembayaran=transaksi_pembayaran,
+                item_pengambilan=item,
+                quantity=item.quantity,
+                harga_satuan=item.harga_satuan,
+                subtotal=item.subtotal
+            )
+            for item in items
+        ])
 
-            transaksi.total_pengambilan = total
-            transaksi.save()
+        return transaksi
 
-            transaksi_pembayaran = TransaksiPembayaran.objects.create(
-                user=sales,
-                jalur=jalur,
-                total_pengambilan=total,
-                jumlah_dibayar=0,
-                status_pembayaran='belum dibayar'
-            )
 
-            for item_pengambilan in transaksi.items.all():
-                ItemPembayaran.objects.create(
-                    transaksi_pembayaran=transaksi_pembayaran,
-                    item_pengambilan=item_pengambilan,
-                    quantity=item_pengambilan.quantity,
-                    harga_satuan=item_pengambilan.harga_satuan,
-                    subtotal=item_pengambilan.subtotal
-                )
+class BatchTransaksiPengambilanSerializer(serializers.Serializer):
+    transaksi = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=100)
 
-            return transaksi
+    def validate_transaksi(self, value):
+        for doc in value:
+            if not doc.get('idempotency_key'):
+                raise serializers.ValidationError("Setiap transaksi wajib memiliki idempotency_key.")
+        return value
 
 
 class ItemPengambilanReadSerializer(serializers.ModelSerializer):
@@ -366,6 +623,7 @@ class TransaksiPengambilanUpdateSerializer(serializers.Serializer):
             raise serializers.ValidationError("User yang dipilih bukan sales.")
         return sales_user
 
+    @atomic_with_retry
     def update(self, instance, validated_data):
         if instance.is_konfirmasi:
             raise serializers.ValidationError("Transaksi yang sudah dikonfirmasi tidak dapat diupdate.")
@@ -374,144 +632,155 @@ class TransaksiPengambilanUpdateSerializer(serializers.Serializer):
         jalur = validated_data['jalur']
         items_data = validated_data['items']
 
-        with transaction.atomic():
-            # update header transaksi
-            instance.user = sales
-            instance.jalur = jalur
-            instance.save()
-
-            total_pengambilan = 0
-            existing_items = {item.id: item for item in instance.items.all()}
-            request_item_ids = [item.get('id') for item in items_data if item.get('id') is not None]
-
-            # Hapus item yang tidak ada di request
-            for item_id, item in existing_items.items():
-                if item_id not in request_item_ids:
-                    stock = Stock.objects.select_for_update().get(product_id=item.product.id)
-
-                    if item.tipe_item == "normal":
-                        stock.quantity += item.quantity
-                        stock.save()
-                    elif item.tipe_item == "retur":
-                        stock.quantity -= item.quantity
-                        stock.save()
-                    # bs -> tidak pengaruhi stok
-
-                    ItemPembayaran.objects.filter(item_pengambilan=item).delete()
-                    item.delete()
-
-            # Tambah/update item baru
-            for item_data in items_data:
-                item_id = item_data.get('id')
-                product = item_data['product']
-                quantity = item_data['quantity']
-                tipe_item = item_data.get('tipe_item', 'normal')
-                tipe_harga = item_data['tipe_harga']
-
-                # Ambil harga sesuai tipe_harga
-                harga = Harga.objects.filter(
+        # update header transaksi
+        instance.user = sales
+        instance.jalur = jalur
+        instance.save()
+
+        total_pengambilan = 0
+        existing_items = {item.id: item for item in instance.items.all()}
+        request_item_ids = [item.get('id') for item in items_data if item.get('id') is not None]
+
+        # Kunci stok semua produk yang terlibat sekaligus, urut product id.
+        # Perubahan quantity dihitung di memori lalu ditulis sekali di akhir.
+        product_ids = {item.product_id for item in existing_items.values()}
+        product_ids.update(item_data['product'].id for item_data in items_data)
+        stocks = lock_stocks(product_ids)
+        stok_awal = {product_id: stock.quantity for product_id, stock in stocks.items()}
+
+        def get_stock(product):
+            try:
+                return stocks[product.id]
+            except KeyError:
+                raise serializers.ValidationError(f"Stok untuk produk '{product.nama}' tidak ditemukan.")
+
+        # Hapus item yang tidak ada di request
+        for item_id, item in existing_items.items():
+            if item_id not in request_item_ids:
+                stock = get_stock(item.product)
+
+                if item.tipe_item == "normal":
+                    stock.quantity += item.quantity
+                elif item.tipe_item == "retur":
+                    stock.quantity -= item.quantity
+                # bs -> tidak pengaruhi stok
+
+                ItemPembayaran.objects.filter(item_pengambilan=item).delete()
+                item.delete()
+
+        # Tambah/update item baru
+        harga_map = get_price_table()
+        waktu = timezone.now()
+        for item_data in items_data:
+            item_id = item_data.get('id')
+            product = item_data['product']
+            quantity = item_data['quantity']
+            tipe_item = item_data.get('tipe_item', 'normal')
+            tipe_harga = item_data['tipe_harga']
+
+            # Ambil harga sesuai tipe_harga
+            harga_satuan = harga_berlaku(harga_map, product.id, tipe_harga, waktu)
+
+            if harga_satuan is None:
+                raise serializers.ValidationError(
+                    f"Harga untuk produk '{product.nama}' dengan tipe '{tipe_harga}' tidak ditemukan."
+                )
+
+            # atur subtotal
+            if tipe_item in ["retur", "bs"]:
+                subtotal = -(harga_satuan * quantity)
+            else:
+                subtotal = harga_satuan * quantity
+
+            stock = get_stock(product)
+
+            if item_id and item_id in existing_items:
+                # Update item lama
+                item = existing_items[item_id]
+                if item.product.id != product.id:
+                    raise serializers.ValidationError("Produk tidak boleh diganti pada item yang sudah ada.")
+
+                selisih = quantity - item.quantity
+
+                if tipe_item == "normal":
+                    if selisih > 0 and stock.quantity < selisih:
+                        raise serializers.ValidationError(
+                            f"Stok tidak mencukupi untuk produk '{product.nama}'. Sisa stok: {stock.quantity}"
+                        )
+                    stock.quantity -= selisih
+                elif tipe_item == "retur":
+                    stock.quantity += selisih
+                # bs -> stok tidak berubah
+
+                item.quantity = quantity
+                item.harga_satuan = harga_satuan
+                item.subtotal = subtotal
+                item.tipe_item = tipe_item
+                item.save()
+
+            else:
+                # Tambah item baru
+                if tipe_item == "normal":
+                    if stock.quantity < quantity:
+                        raise serializers.ValidationError(
+                            f"Stok tidak mencukupi untuk produk '{product.nama}'. Sisa stok: {stock.quantity}"
+                        )
+                    stock.quantity -= quantity
+                elif tipe_item == "retur":
+                    stock.quantity += quantity
+                # bs -> stok tidak berubah
+
+                ItemPengambilan.objects.create(
+                    transaksi=instance,
                     product=product,
-                    tipe_harga=tipe_harga,
-                    is_delete=False
-                ).first()
+                    quantity=quantity,
+                    harga_satuan=harga_satuan,
+                    subtotal=subtotal,
+                    tipe_item=tipe_item
+                )
 
-                if not harga:
-                    raise serializers.ValidationError(
-                        f"Harga untuk produk '{product.nama}' dengan tipe '{tipe_harga}' tidak ditemukan."
-                    )
+            total_pengambilan += subtotal
 
-                harga_satuan = harga.harga
-
-                # atur subtotal
-                if tipe_item in ["retur", "bs"]:
-                    subtotal = -(harga_satuan * quantity)
-                else:
-                    subtotal = harga_satuan * quantity
-
-                stock = Stock.objects.select_for_update().get(product_id=product.id)
-
-                if item_id and item_id in existing_items:
-                    # Update item lama
-                    item = existing_items[item_id]
-                    if item.product.id != product.id:
-                        raise serializers.ValidationError("Produk tidak boleh diganti pada item yang sudah ada.")
-
-                    selisih = quantity - item.quantity
-
-                    if tipe_item == "normal":
-                        if selisih > 0 and stock.quantity < selisih:
-                            raise serializers.ValidationError(
-                                f"Stok tidak mencukupi untuk produk '{product.nama}'. Sisa stok: {stock.quantity}"
-                            )
-                        stock.quantity -= selisih
-                        stock.save()
-                    elif tipe_item == "retur":
-                        stock.quantity += selisih
-                        stock.save()
-                    # bs -> stok tidak berubah
-
-                    item.quantity = quantity
-                    item.harga_satuan = harga_satuan
-                    item.subtotal = subtotal
-                    item.tipe_item = tipe_item
-                    item.save()
-
-                else:
-                    # Tambah item baru
-                    if tipe_item == "normal":
-                        if stock.quantity < quantity:
-                            raise serializers.ValidationError(
-                                f"Stok tidak mencukupi untuk produk '{product.nama}'. Sisa stok: {stock.quantity}"
-                            )
-                        stock.quantity -= quantity
-                        stock.save()
-                    elif tipe_item == "retur":
-                        stock.quantity += quantity
-                        stock.save()
-                    # bs -> stok tidak berubah
-
-                    ItemPengambilan.objects.create(
-                        transaksi=instance,
-                        product=product,
-                        quantity=quantity,
-                        harga_satuan=harga_satuan,
-                        subtotal=subtotal,
-                        tipe_item=tipe_item
-                    )
+        apply_stock_deltas({
+            product_id: stock.quantity - stok_awal[product_id]
+            for product_id, stock in stocks.items()
+        }, 'pengambilan', instance.id)
 
-                total_pengambilan += subtotal
-
-            # Simpan total akhir transaksi
-            instance.total_pengambilan = total_pengambilan
-            instance.save()
-
-            # Sinkronisasi pembayaran
-            transaksi_pembayaran, _ = TransaksiPembayaran.objects.get_or_create(
-                user=sales,
-                jalur=jalur,
-                tanggal_pembayaran=instance.tanggal_pengambilan,
-                defaults={
-                    'total_pengambilan': total_pengambilan,
-                    'jumlah_dibayar': 0,
-                    'status_pembayaran': 'belum dibayar',
-                }
+        # Simpan total akhir transaksi
+        instance.total_pengambilan = total_pengambilan
+        instance.save()
+
+        # Sinkronisasi pembayaran
+        transaksi_pembayaran, created = TransaksiPembayaran.objects.get_or_create(
+            user=sales,
+            jalur=jalur,
+            tanggal_pembayaran=instance.tanggal_pengambilan,
+            defaults={
+                'total_pengambilan': total_pengambilan,
+                'jumlah_dibayar': 0,
+                'status_pembayaran': 'belum dibayar',
+            }
+        )
+        if created:
+            catat_perubahan_piutang(transaksi_pembayaran, 0)
+        else:
+            transaksi_pembayaran = TransaksiPembayaran.objects.select_for_update().get(pk=transaksi_pembayaran.pk)
+            piutang_lama = nilai_piutang(transaksi_pembayaran)
+            transaksi_pembayaran.total_pengambilan = total_pengambilan
+            sync_pembayaran(transaksi_pembayaran, piutang_lama)
+
+        # Update ulang item pembayaran
+        transaksi_pembayaran.items.all().delete()
+        for item in instance.items.all():
+            ItemPembayaran.objects.create(
+                transaksi_pembayaran=transaksi_pembayaran,
+                item_pengambilan=item,
+                quantity=item.quantity,
+                harga_satuan=item.harga_satuan,
+                subtotal=item.subtotal
             )
-            if not transaksi_pembayaran._state.adding:
-                transaksi_pembayaran.total_pengambilan = total_pengambilan
-                transaksi_pembayaran.save()
-
-            # Update ulang item pembayaran
-            transaksi_pembayaran.items.all().delete()
-            for item in instance.items.all():
-                ItemPembayaran.objects.create(
-                    transaksi_pembayaran=transaksi_pembayaran,
-                    item_pengambilan=item,
-                    quantity=item.quantity,
-                    harga_satuan=item.harga_satuan,
-                    subtotal=item.subtotal
-                )
 
-            return instance
+        return instance
 
 class ItemPembayaranSerializer(serializers.ModelSerializer):
     class Meta:
@@ -542,35 +811,18 @@ class BayarSerializer(serializers.Serializer):
     jumlah_dibayar = serializers.DecimalField(max_digits=12, decimal_places=2)
 
     def validate(self, data):
-        try:
-            pembayaran = TransaksiPembayaran.objects.get(id=data["pembayaran_id"])
-        except TransaksiPembayaran.DoesNotExist:
+        if not TransaksiPembayaran.objects.filter(id=data["pembayaran_id"]).exists():
             raise serializers.ValidationError("Transaksi pembayaran tidak ditemukan")
-
-        data["pembayaran"] = pembayaran
         return data
 
     def save(self, **kwargs):
-        pembayaran = self.validated_data["pembayaran"]
-        jumlah_dibayar = self.validated_data["jumlah_dibayar"]
-
-        # update jumlah dibayar
-        pembayaran.jumlah_dibayar += jumlah_dibayar
-
-        # hitung kekurangan
-        pembayaran.kekurangan_bayar = pembayaran.total_pengambilan - pembayaran.jumlah_dibayar
-
-        # tentukan status
-        if pembayaran.jumlah_dibayar <= 0:
-            pembayaran.status_pembayaran = "belum dibayar"
-        elif 0 < pembayaran.jumlah_dibayar < pembayaran.total_pengambilan:
-            pembayaran.status_pembayaran = "belum lunas"
-        elif pembayaran.jumlah_dibayar >= pembayaran.total_pengambilan:
-            pembayaran.status_pembayaran = "lunas"
-            pembayaran.kekurangan_bayar = 0
-
-        pembayaran.save()
-        return pembayaran
+        request = self.context.get('request')
+        return apply_payment(
+            self.validated_data["pembayaran_id"],
+            self.validated_data["jumlah_dibayar"],
+            'bayar',
+            user=request.user if request and request.user.is_authenticated else None
+        )
     
     
 class CicilPembayaranSerializer(serializers.Serializer):
@@ -583,30 +835,11 @@ class CicilPembayaranSerializer(serializers.Serializer):
         return data
 
     def save(self, **kwargs):
-        pembayaran_id = self.validated_data["pembayaran_id"]
-        jumlah_dibayar = self.validated_data["jumlah_dibayar"]
-
-        try:
-            pembayaran = TransaksiPembayaran.objects.get(id=pembayaran_id)
-        except TransaksiPembayaran.DoesNotExist:
-            raise serializers.ValidationError("Transaksi pembayaran tidak ditemukan")
-
-        # Tambahkan cicilan
-        pembayaran.jumlah_dibayar += jumlah_dibayar
-        pembayaran.kekurangan_bayar = pembayaran.total_pengambilan - pembayaran.jumlah_dibayar
-
-        # Tidak boleh minus
-        if pembayaran.kekurangan_bayar < 0:
-            pembayaran.kekurangan_bayar = 0
-            pembayaran.jumlah_dibayar = pembayaran.total_pengambilan
-
-        # Tentukan status
-        if pembayaran.jumlah_dibayar >= pembayaran.total_pengambilan:
-            pembayaran.status_pembayaran = "lunas"
-        elif pembayaran.jumlah_dibayar > 0:
-            pembayaran.status_pembayaran = "belum lunas"
-        else:
-            pembayaran.status_pembayaran = "belum dibayar"
-
-        pembayaran.save()
-        return pembayaran
\ No newline at end of file
+        request = self.context.get('request')
+        # Cicilan tidak boleh melebihi sisa tagihan (dibatasi di apply_payment)
+        return apply_payment(
+            self.validated_data["pembayaran_id"],
+            self.validated_data["jumlah_dibayar"],
+            'cicil',
+            user=request.user if request and request.user.is_authenticated else None
+        )
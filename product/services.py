@@ -0,0 +1,180 @@
+import logging
+import random
+import time
+from functools import wraps
+
+from django.db import connection, transaction, OperationalError
+from django.db.models import Case, When, F, Sum
+from django.utils import timezone
+from rest_framework import serializers
+
+from BE import metrics
+from .catalog import bump_catalog_version
+from .dashboard import invalidate_dashboard
+from .laporan import nilai_piutang, catat_perubahan_piutang
+from .models import Stock, StockMovement, TransaksiPembayaran, PembayaranEntry
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE postgres: deadlock_detected & serialization_failure
+RETRYABLE_SQLSTATE = {'40P01', '40001'}
+MAX_ATTEMPTS = 3
+
+
+def is_retryable(exc):
+    cause = exc.__cause__
+    sqlstate = getattr(cause, 'pgcode', None) or getattr(cause, 'sqlstate', None)
+    return sqlstate in RETRYABLE_SQLSTATE
+
+
+def atomic_with_retry(func=None, *, max_attempts=MAX_ATTEMPTS):
+    """
+    Jalankan func di dalam transaction.atomic() dan ulangi (maksimal
+    max_attempts kali) bila database membatalkan transaksi karena deadlock
+    atau serialization failure. Jika sudah berada di dalam transaksi luar,
+    retry tidak mungkin dilakukan sehingga error langsung diteruskan.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            attempt = 1
+            while True:
+                try:
+                    with transaction.atomic():
+                        return func(*args, **kwargs)
+                except OperationalError as exc:
+                    if not is_retryable(exc):
+                        raise
+                    if connection.in_atomic_block or attempt >= max_attempts:
+                        metrics.incr('stock.retry.gagal')
+                        raise
+                    metrics.incr('stock.retry')
+                    logger.warning("Retry %s (percobaan %s/%s): %s", func.__qualname__, attempt, max_attempts, exc)
+                    time.sleep(random.uniform(0, 0.05 * attempt))
+                    attempt += 1
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def ensure_stocks(product_ids):
+    """Buat baris Stock (quantity 0) untuk produk yang belum punya stok."""
+    product_ids = set(product_ids)
+    existing = set(Stock.objects.filter(product_id__in=product_ids).values_list('product_id', flat=True))
+    missing = product_ids - existing
+    if missing:
+        Stock.objects.bulk_create(
+            [Stock(product_id_id=product_id, quantity=0) for product_id in sorted(missing)],
+            ignore_conflicts=True
+        )
+
+
+def lock_stocks(product_ids):
+    """
+    Kunci baris Stock untuk semua product_ids dalam satu query, selalu urut
+    product id naik supaya dua transaksi yang overlap tidak saling deadlock.
+    Harus dipanggil di dalam transaksi.
+    """
+    return {
+        stock.pk: stock
+        for stock in Stock.objects.select_for_update()
+        .filter(product_id__in=set(product_ids))
+        .order_by('product_id')
+    }
+
+
+def apply_stock_deltas(deltas, reason, source_id=None):
+    """
+    Terapkan perubahan stok {product_id: delta}: catat ke ledger StockMovement
+    dengan satu bulk insert, lalu perbarui saldo Stock dengan satu UPDATE
+    berbasis F() (tanpa read-modify-write).
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=product_id, delta=delta, reason=reason, source_id=source_id)
+        for product_id, delta in sorted(deltas.items())
+    ])
+    Stock.objects.filter(product_id__in=deltas.keys()).update(
+        quantity=Case(
+            *[When(product_id=product_id, then=F('quantity') + delta)
+              for product_id, delta in sorted(deltas.items())],
+            default=F('quantity')
+        ),
+        updated_at=timezone.now()
+    )
+    bump_catalog_version()
+
+
+def stock_as_of(waktu, product_ids=None):
+    """Saldo stok per produk pada waktu tertentu, dihitung dari ledger."""
+    movements = StockMovement.objects.filter(created_at__lte=waktu)
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    return {
+        row['product_id']: row['total']
+        for row in movements.values('product_id').annotate(total=Sum('delta'))
+    }
+
+
+def status_pembayaran(total, dibayar):
+    if dibayar <= 0:
+        return 'belum dibayar'
+    if dibayar < total:
+        return 'belum lunas'
+    return 'lunas'
+
+
+def sync_pembayaran(pembayaran, piutang_lama=None):
+    """
+    Hitung ulang jumlah_dibayar, kekurangan_bayar dan status dari ledger
+    PembayaranEntry, lalu teruskan selisih piutangnya ke RekapPiutang.
+    Baris pembayaran harus sudah dikunci oleh pemanggil. piutang_lama adalah
+    piutang yang sudah tercatat di rekap (default: nilai saat ini di instance).
+    """
+    if piutang_lama is None:
+        piutang_lama = nilai_piutang(pembayaran)
+    dibayar = pembayaran.entries.aggregate(total=Sum('jumlah'))['total'] or 0
+    pembayaran.jumlah_dibayar = dibayar
+    pembayaran.kekurangan_bayar = max(pembayaran.total_pengambilan - dibayar, 0)
+    pembayaran.status_pembayaran = status_pembayaran(pembayaran.total_pengambilan, dibayar)
+    TransaksiPembayaran.objects.filter(pk=pembayaran.pk).update(
+        total_pengambilan=pembayaran.total_pengambilan,
+        jumlah_dibayar=pembayaran.jumlah_dibayar,
+        kekurangan_bayar=pembayaran.kekurangan_bayar,
+        status_pembayaran=pembayaran.status_pembayaran,
+    )
+    catat_perubahan_piutang(pembayaran, piutang_lama)
+    invalidate_dashboard()
+    return pembayaran
+
+
+@atomic_with_retry
+def apply_payment(pembayaran_id, jumlah, jenis, user=None):
+    """
+    Catat pembayaran ke ledger dengan baris TransaksiPembayaran terkunci,
+    sehingga pembayaran paralel tidak saling menimpa.
+
+    jenis 'bayar' mencatat jumlah apa adanya, 'cicil' dibatasi sisa tagihan,
+    'pelunasan' mengabaikan jumlah dan membayar seluruh sisa.
+    """
+    try:
+        pembayaran = TransaksiPembayaran.objects.select_for_update().get(pk=pembayaran_id)
+    except TransaksiPembayaran.DoesNotExist:
+        raise serializers.ValidationError("Transaksi pembayaran tidak ditemukan")
+
+    dibayar = pembayaran.entries.aggregate(total=Sum('jumlah'))['total'] or 0
+    sisa = pembayaran.total_pengambilan - dibayar
+    if jenis == 'pelunasan':
+        if sisa <= 0:
+            raise serializers.ValidationError("Pembayaran sudah lunas")
+        jumlah = sisa
+    elif jenis == 'cicil':
+        jumlah = min(jumlah, max(sisa, 0))
+
+    if jumlah:
+        PembayaranEntry.objects.create(transaksi_pembayaran=pembayaran, jumlah=jumlah, jenis=jenis, user=user)
+    return sync_pembayaran(pembayaran)
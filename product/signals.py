@@ -0,0 +1,39 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from toko.models import Jalur
+from .catalog import bump_catalog_version
+from .dashboard import invalidate_dashboard
+from .pricing import invalidate_harga, catat_riwayat_harga
+from .models import Product, Harga, RiwayatHarga, Stock, Suplier, TransaksiPengambilan, TransaksiPembayaran
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Suplier)
+@receiver([post_save, post_delete], sender=Jalur)
+@receiver([post_save, post_delete], sender=TransaksiPengambilan)
+@receiver([post_save, post_delete], sender=TransaksiPembayaran)
+@receiver(post_delete, sender=User)
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=Jalur.users.through)
+def dashboard_changed(sender, **kwargs):
+    invalidate_dashboard()
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Harga)
+@receiver([post_save, post_delete], sender=Stock)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Harga)
+def harga_saved(sender, instance, **kwargs):
+    catat_riwayat_harga(instance)
+
+
+@receiver([post_save, post_delete], sender=Harga)
+@receiver([post_save, post_delete], sender=RiwayatHarga)
+def harga_changed(sender, **kwargs):
+    invalidate_harga()
@@ -0,0 +1,74 @@
+import base64
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from toko.models import Jalur, Toko
+from .models import Product, Harga, Stock
+
+# Token dimundurkan sedikit agar baris yang commit terlambat (updated_at lebih
+# kecil dari waktu sync) tetap terkirim di sync berikutnya. Client melakukan upsert.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+PRODUCT_FIELDS = ['id', 'nama', 'foto_product', 'is_delete', 'updated_at']
+HARGA_FIELDS = ['id', 'product_id', 'tipe_harga', 'harga', 'is_delete', 'updated_at']
+STOCK_FIELDS = ['product_id', 'quantity', 'updated_at']
+JALUR_FIELDS = ['id', 'nama', 'updated_at']
+TOKO_FIELDS = ['id', 'nama', 'alamat', 'koordinat', 'telepon', 'is_pasar', 'jalur_id', 'is_delete', 'updated_at']
+
+
+def encode_token(waktu):
+    return base64.urlsafe_b64encode(waktu.isoformat().encode()).decode()
+
+
+def decode_token(token):
+    try:
+        waktu = parse_datetime(base64.urlsafe_b64decode(token.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if waktu is None or timezone.is_naive(waktu):
+        return None
+    return waktu
+
+
+def build_sync(since=None, jalur_ids=None):
+    """
+    Perubahan katalog & jalur sejak waktu `since` (None = sync penuh).
+    jalur_ids membatasi jalur/toko (untuk sales); None = semua jalur.
+    Baris yang di-soft delete ikut terkirim dengan is_delete=True.
+    """
+    next_token = encode_token(timezone.now() - SYNC_OVERLAP)
+
+    products = Product.objects.all()
+    harga = Harga.objects.all()
+    stock = Stock.objects.all()
+    jalur = Jalur.objects.all()
+    toko = Toko.objects.all()
+    if jalur_ids is not None:
+        jalur = jalur.filter(id__in=jalur_ids)
+        toko = toko.filter(jalur_id__in=jalur_ids)
+
+    if since is None:
+        products = products.filter(is_delete=False)
+        harga = harga.filter(is_delete=False, product__is_delete=False)
+        stock = stock.filter(product_id__is_delete=False)
+        toko = toko.filter(is_delete=False)
+    else:
+        products = products.filter(updated_at__gt=since)
+        harga = harga.filter(updated_at__gt=since)
+        stock = stock.filter(updated_at__gt=since)
+        jalur = jalur.filter(updated_at__gt=since)
+        # Jalur yang baru di-assign (updated_at disentuh) ikut mengirim semua tokonya
+        toko = toko.filter(Q(updated_at__gt=since) | Q(jalur__updated_at__gt=since))
+
+    return {
+        'token': next_token,
+        'full': since is None,
+        'products': list(products.order_by('id').values(*PRODUCT_FIELDS)),
+        'harga': list(harga.order_by('id').values(*HARGA_FIELDS)),
+        'stock': list(stock.order_by('product_id').values(*STOCK_FIELDS)),
+        'jalur': list(jalur.order_by('id').values(*JALUR_FIELDS)),
+        'toko': list(toko.order_by('id').values(*TOKO_FIELDS)),
+    }
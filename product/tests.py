@@ -1,3 +1,780 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+import csv
+import json
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User, Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, OperationalError
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from BE import slow_queries
+from BE.middleware import QueryBudgetExceeded
+from toko.models import Jalur, Toko
+from .models import (TransaksiPembayaran, PembayaranEntry, RekapPiutang, Product, TransaksiPengambilan,
+                     ItemPengambilan, ItemPembayaran, RekapPenjualanHarian, Harga, RiwayatHarga, Stock, StockMovement, Suplier, Belanja)
+from .serializers import TransaksiPengambilanSerializer
+from .services import apply_payment, apply_stock_deltas, lock_stocks
+from .pricing import get_harga, terapkan_jadwal_harga
+from .sync import build_sync
+
+
+def buat_pembayaran(total):
+    user = User.objects.create_user('sales', password='rahasia')
+    jalur = Jalur.objects.create(nama='Jalur 1')
+    return TransaksiPembayaran.objects.create(user=user, jalur=jalur, total_pengambilan=total, jumlah_dibayar=0)
+
+
+class PembayaranTest(TestCase):
+    def setUp(self):
+        self.pembayaran = buat_pembayaran(Decimal('100000'))
+        self.client = APIClient()
+
+    def test_cicil_tidak_melebihi_sisa(self):
+        self.client.post('/api/transaksi-cicil/', {'pembayaran_id': self.pembayaran.id, 'jumlah_dibayar': 60000})
+        response = self.client.post('/api/transaksi-cicil/', {'pembayaran_id': self.pembayaran.id, 'jumlah_dibayar': 60000})
+        self.assertEqual(response.data['jumlah_dibayar'], Decimal('100000'))
+        self.assertEqual(response.data['kekurangan_bayar'], 0)
+        self.assertEqual(response.data['status_pembayaran'], 'lunas')
+        self.assertEqual(PembayaranEntry.objects.filter(transaksi_pembayaran=self.pembayaran).count(), 2)
+
+    def test_bayar_lalu_pelunasan(self):
+        response = self.client.post('/api/transaksi-pembayaran/', {'pembayaran_id': self.pembayaran.id, 'jumlah_dibayar': '25000'})
+        self.assertEqual(response.data['status_pembayaran'], 'belum lunas')
+        self.assertEqual(Decimal(response.data['kekurangan_bayar']), Decimal('75000'))
+
+        response = self.client.post('/api/transaksi-pelunasan/', {'pembayaran_id': self.pembayaran.id})
+        self.assertEqual(response.data['status_pembayaran'], 'lunas')
+        self.assertEqual(
+            [entry.jumlah for entry in self.pembayaran.entries.order_by('id')],
+            [Decimal('25000'), Decimal('75000')]
+        )
+
+        response = self.client.post('/api/transaksi-pelunasan/', {'pembayaran_id': self.pembayaran.id})
+        self.assertEqual(response.status_code, 400)
+
+
+class PengambilanQueryTest(TestCase):
+    def setUp(self):
+        self.sales = User.objects.create_user('sales', password='rahasia')
+        self.sales.groups.add(Group.objects.create(name='sales'))
+        self.jalur = Jalur.objects.create(nama='Jalur 1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.sales)
+        self.products = Product.objects.bulk_create([
+            Product(nama=f'Roti {i}', foto_product='https://contoh.id/roti.png') for i in range(50)
+        ])
+        Stock.objects.bulk_create([Stock(product_id=product, quantity=100) for product in self.products])
+        Harga.objects.bulk_create([
+            Harga(product=product, tipe_harga='Harga ke toko', harga=5000) for product in self.products
+        ])
+
+    def jumlah_query(self, jumlah_item):
+        cache.clear()
+        items = [{'product': product.id, 'quantity': 2, 'tipe_harga': 'Harga ke toko'}
+                 for product in self.products[:jumlah_item]]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/transaksi-pengambilan/', {'jalur': self.jalur.id, 'items': items},
+                                        format='json')
+        self.assertEqual(response.status_code, 201)
+        return response, len(context.captured_queries)
+
+    def test_query_konstan(self):
+        # Pengambilan pertama hari itu juga membuat baris RekapPiutang
+        self.jumlah_query(1)
+        _, query_1 = self.jumlah_query(1)
+        response, query_50 = self.jumlah_query(50)
+        self.assertEqual(query_1, query_50)
+        self.assertEqual(len(response.data['data']['items']), 50)
+        self.assertEqual(Decimal(response.data['data']['total_pengambilan']), Decimal('500000'))
+        self.assertEqual(Stock.objects.get(product_id=self.products[0]).quantity, 94)
+
+
+class BelanjaQueryTest(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user('admin', password='rahasia')
+        admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.suplier = Suplier.objects.create(pt='PT Tepung', nama='Budi', alamat='Pasar', telepon='0800')
+        self.products = Product.objects.bulk_create([
+            Product(nama=f'Roti {i}', foto_product='https://contoh.id/roti.png') for i in range(100)
+        ])
+        Stock.objects.bulk_create([Stock(product_id=product, quantity=0) for product in self.products])
+
+    def jumlah_query_update(self, jumlah_item):
+        items = [{'product': product.id, 'jumlah_belanja': '1000', 'quantity': 5}
+                 for product in self.products[:jumlah_item]]
+        response = self.client.post('/api/belanja/', {'suplier': self.suplier.id, 'items': items}, format='json')
+        for item in response.data['items']:
+            item['quantity'] = 8
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.put(f"/api/belanja/{response.data['id']}/",
+                                       {'suplier': self.suplier.id, 'items': response.data['items']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_update_query_konstan(self):
+        _, query_1 = self.jumlah_query_update(1)
+        response, query_100 = self.jumlah_query_update(100)
+        self.assertEqual(query_1, query_100)
+        self.assertEqual({item['quantity'] for item in response.data['items']}, {8})
+        self.assertEqual(response.data['items'][-1]['product_nama'], 'Roti 99')
+        self.assertEqual(Stock.objects.get(product_id=self.products[0]).quantity, 16)
+
+
+class TanggalTidakValidTest(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user('admin', password='rahasia')
+        admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def test_tanggal_tidak_ada_400(self):
+        for url, param in [
+            ('/api/stock/', 'per_tanggal'),
+            ('/api/transaksi-pengambilan/getall', 'tanggal_dari'),
+            ('/api/transaksi-pengambilan/getall', 'tanggal_sampai'),
+            ('/api/export/transaksi-pengambilan/', 'tanggal_dari'),
+            ('/api/export/transaksi-pembayaran/', 'tanggal_sampai'),
+            ('/api/laporan/penjualan/', 'dari'),
+        ]:
+            response = self.client.get(url, {param: '2024-02-30'})
+            self.assertEqual(response.status_code, 400, url)
+            self.assertIn(param, response.data)
+
+
+class SyncDeltaTest(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user('admin', password='rahasia')
+        admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.sales = User.objects.create_user('sales', password='rahasia')
+        self.jalur = Jalur.objects.create(nama='Jalur 1')
+        Toko.objects.create(nama='Toko 1', alamat='Pasar', koordinat='0,0', telepon='0800', jalur=self.jalur)
+        product = Product.objects.create(nama='Roti Tawar', foto_product='https://contoh.id/roti.png')
+        self.harga = Harga.objects.create(product=product, tipe_harga='Harga ke toko', harga=5000)
+
+        # Semua data sudah tersinkron sebelum `since`
+        lama = timezone.now() - timedelta(days=2)
+        for model in (Product, Harga, Jalur, Toko):
+            model.objects.update(updated_at=lama)
+        self.since = timezone.now() - timedelta(days=1)
+
+    def test_harga_dihapus_terkirim(self):
+        response = self.client.delete(f'/api/harga/{self.harga.id}/')
+        self.assertEqual(response.status_code, 200)
+        harga = build_sync(self.since)['harga']
+        self.assertEqual([(row['id'], row['is_delete']) for row in harga], [(self.harga.id, True)])
+
+        data = {'product': self.harga.product_id, 'tipe_harga': 'Harga ke toko', 'harga': 6000}
+        response = self.client.post('/api/harga/', data, format='json')
+        self.assertEqual(response.data['id'], self.harga.id)
+
+    def test_add_harga_setelah_dihapus(self):
+        self.client.delete(f'/api/harga/{self.harga.id}/')
+        url = f'/api/products/{self.harga.product_id}/add-harga/'
+        response = self.client.post(url, {'tipe_harga': 'Harga ke toko', 'harga': 6500}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['id'], self.harga.id)
+        self.harga.refresh_from_db()
+        self.assertEqual((self.harga.harga, self.harga.is_delete), (Decimal('6500'), False))
+
+        response = self.client.post(url, {'tipe_harga': 'Harga ke toko', 'harga': 7000}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_jalur_baru_diassign_terkirim(self):
+        self.client.post('/api/jalur/assign/', {'user_id': self.sales.id, 'jalur_ids': [self.jalur.id]}, format='json')
+        data = build_sync(self.since, [self.jalur.id])
+        self.assertEqual([row['id'] for row in data['jalur']], [self.jalur.id])
+        self.assertEqual([row['nama'] for row in data['toko']], ['Toko 1'])
+
+
+class IdempotencyTest(TestCase):
+    def setUp(self):
+        sales_group = Group.objects.create(name='sales')
+        self.sales = User.objects.create_user('sales', password='rahasia')
+        self.lain = User.objects.create_user('sales2', password='rahasia')
+        for user in (self.sales, self.lain):
+            user.groups.add(sales_group)
+        self.jalur = Jalur.objects.create(nama='Jalur 1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.sales)
+        self.product = Product.objects.create(nama='Roti Tawar', foto_product='https://contoh.id/roti.png')
+        Stock.objects.create(product_id=self.product, quantity=100)
+        Harga.objects.create(product=self.product, tipe_harga='Harga ke toko', harga=5000)
+
+    def dokumen(self, key, product=None):
+        return {'jalur': self.jalur.id, 'idempotency_key': key,
+                'items': [{'product': product or self.product.id, 'quantity': 2, 'tipe_harga': 'Harga ke toko'}]}
+
+    def test_kirim_ulang(self):
+        pertama = self.client.post('/api/transaksi-pengambilan/', self.dokumen('k1'), format='json')
+        kedua = self.client.post('/api/transaksi-pengambilan/', self.dokumen('k1'), format='json')
+        self.assertEqual((pertama.status_code, kedua.status_code), (201, 200))
+        self.assertEqual(kedua.data['data']['id'], pertama.data['data']['id'])
+        self.assertEqual(TransaksiPengambilan.objects.count(), 1)
+        self.assertEqual(Stock.objects.get().quantity, 98)
+
+    def test_key_milik_user_lain(self):
+        TransaksiPengambilan.objects.create(user=self.lain, jalur=self.jalur, idempotency_key='k1')
+        response = self.client.post('/api/transaksi-pengambilan/', self.dokumen('k1'), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('idempotency_key', response.data)
+
+    def test_kirim_ulang_paralel(self):
+        save = TransaksiPengambilanSerializer.save
+
+        def save_didahului(serializer, **kwargs):
+            # Request lain dengan key yang sama commit lebih dulu
+            TransaksiPengambilan.objects.create(user=self.sales, jalur=self.jalur, idempotency_key='k1')
+            return save(serializer, **kwargs)
+
+        with mock.patch.object(TransaksiPengambilanSerializer, 'save', save_didahului):
+            response = self.client.post('/api/transaksi-pengambilan/', self.dokumen('k1'), format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(TransaksiPengambilan.objects.count(), 1)
+        self.assertEqual(Stock.objects.get().quantity, 100)
+
+    def test_batch_campuran(self):
+        self.client.post('/api/transaksi-pengambilan/', self.dokumen('lama'), format='json')
+        TransaksiPengambilan.objects.create(user=self.lain, jalur=self.jalur, idempotency_key='punya-lain')
+        data = {'transaksi': [
+            self.dokumen('baru'),
+            self.dokumen('lama'),
+            self.dokumen('rusak', product=999),
+            self.dokumen('punya-lain'),
+        ]}
+        response = self.client.post('/api/transaksi-pengambilan/batch/', data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['status'] for row in response.data['results']], ['dibuat', 'duplikat', 'gagal', 'gagal'])
+        self.assertEqual(TransaksiPengambilan.objects.filter(user=self.sales).count(), 2)
+
+        response = self.client.post('/api/transaksi-pengambilan/batch/', data, format='json')
+        self.assertEqual([row['status'] for row in response.data['results']], ['duplikat', 'duplikat', 'gagal', 'gagal'])
+
+
+class CatalogETagTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('sales', password='rahasia'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(nama='Roti Tawar', foto_product='https://contoh.id/roti.png')
+            self.stock = Stock.objects.create(product_id=self.product, quantity=10)
+            self.harga = Harga.objects.create(product=self.product, tipe_harga='Harga ke toko', harga=5000)
+
+    def etag(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_if_none_match_304(self):
+        etag = self.etag()
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_berubah_setelah_write(self):
+        def ubah_harga():
+            self.harga.harga = 6000
+            self.harga.save()
+
+        def ubah_stok():
+            response = self.client.put(f'/api/stock/{self.product.id}', {'product_id': self.product.id, 'quantity': 20})
+            self.assertEqual(response.status_code, 200)
+
+        def ubah_produk():
+            self.product.nama = 'Roti Manis'
+            self.product.save()
+
+        for ubah in (ubah_harga, ubah_stok, ubah_produk):
+            etag = self.etag()
+            with self.captureOnCommitCallbacks(execute=True):
+                ubah()
+            self.assertNotEqual(self.etag(), etag, ubah.__name__)
+            self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        data = self.client.get('/api/products/').data[0]
+        self.assertEqual((data['nama'], data['stock']['quantity']), ('Roti Manis', 20))
+
+
+class DashboardCacheTest(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user('admin', password='rahasia')
+        admin.groups.add(Group.objects.create(name='admin'))
+        self.admin = APIClient()
+        self.admin.force_authenticate(admin)
+        sales = User.objects.create_user('sales', password='rahasia')
+        sales.groups.add(Group.objects.create(name='sales'))
+        self.sales = APIClient()
+        self.sales.force_authenticate(sales)
+        self.jalur = Jalur.objects.create(nama='Jalur 1')
+        product = Product.objects.create(nama='Roti Tawar', foto_product='https://contoh.id/roti.png')
+        Stock.objects.create(product_id=product, quantity=100)
+        with self.captureOnCommitCallbacks(execute=True):
+            Harga.objects.create(product=product, tipe_harga='Harga ke toko', harga=5000)
+        self.items = [{'product': product.id, 'quantity': 2, 'tipe_harga': 'Harga ke toko'}]
+
+    def summary(self):
+        return self.admin.get('/api/dashboard/summary').data
+
+    def test_write_mengubah_summary(self):
+        awal = self.summary()
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.summary(), awal)
+        self.assertFalse([query for query in context.captured_queries if 'product_transaksi' in query['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.sales.post('/api/transaksi-pengambilan/', {'jalur': self.jalur.id, 'items': self.items},
+                                       format='json')
+        self.assertEqual(response.status_code, 201)
+        summary = self.summary()
+        self.assertEqual(summary['pengambilan_hari_ini'], awal['pengambilan_hari_ini'] + 10000)
+        self.assertEqual(summary['piutang'], awal['piutang'] + 10000)
+
+        pembayaran = TransaksiPembayaran.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_payment(pembayaran.id, Decimal('4000'), 'bayar')
+        self.assertEqual(self.summary()['piutang'], awal['piutang'] + 6000)
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user('admin', password='rahasia')
+        admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        sales = User.objects.create_user('sales', password='rahasia')
+        jalur = Jalur.objects.create(nama='Jalur 1')
+        product = Product.objects.create(nama='Roti Tawar', foto_product='https://contoh.id/roti.png')
+        self.transaksi = TransaksiPengambilan.objects.create(user=sales, jalur=jalur, total_pengambilan=15000)
+        pembayaran = TransaksiPembayaran.objects.create(user=sales, jalur=jalur, total_pengambilan=15000,
+                                                        jumlah_dibayar=0)
+        for quantity in (1, 2):
+            item = ItemPengambilan.objects.create(transaksi=self.transaksi, product=product, quantity=quantity,
+                                                  harga_satuan=5000, subtotal=5000 * quantity)
+            ItemPembayaran.objects.create(transaksi_pembayaran=pembayaran, item_pengambilan=item,
+                                          quantity=quantity, harga_satuan=5000, subtotal=5000 * quantity)
+
+    def isi(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_pengambilan(self):
+        response = self.client.get('/api/export/transaksi-pengambilan/', {'output': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(StringIO(self.isi(response))))
+        self.assertEqual([(row['sales'], row['product'], row['quantity'], row['subtotal']) for row in rows],
+                         [('sales', 'Roti Tawar', '1', '5000.00'), ('sales', 'Roti Tawar', '2', '10000.00')])
+
+    def test_ndjson_pembayaran(self):
+        response = self.client.get('/api/export/transaksi-pembayaran/')
+        rows = [json.loads(line) for line in self.isi(response).splitlines()]
+        self.assertEqual([row['quantity'] for row in rows], [1, 2])
+        self.assertEqual({row['status_pembayaran'] for row in rows}, {'belum dibayar'})
+
+    def test_filter_tanggal(self):
+        besok = self.transaksi.tanggal_pengambilan + timedelta(days=1)
+        response = self.client.get('/api/export/transaksi-pengambilan/', {'tanggal_dari': besok})
+        self.assertEqual(self.isi(response), '')
+        response = self.client.get('/api/export/transaksi-pengambilan/', {'tanggal_dari': 'kemarin'})
+        self.assertEqual(response.status_code, 400)
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user('admin', password='rahasia')
+        admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        sales = User.objects.create_user('sales', password='rahasia')
+        jalur = Jalur.objects.create(nama='Jalur 1')
+        transaksi = [TransaksiPengambilan.objects.create(user=sales, jalur=jalur) for _ in range(7)]
+        kemarin = timezone.localdate() - timedelta(days=1)
+        TransaksiPengambilan.objects.filter(pk__in=[t.pk for t in transaksi[4:]]).update(tanggal_pengambilan=kemarin)
+        # Urutan yang diharapkan: hari ini (id menurun) lalu kemarin (id menurun)
+        self.urutan = [t.pk for t in reversed(transaksi[:4])] + [t.pk for t in reversed(transaksi[4:])]
+
+    def test_mengikuti_next_tanpa_duplikat(self):
+        ids = []
+        url = '/api/transaksi-pengambilan/getall?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, self.urutan)
+
+    def test_cursor_tidak_valid_400(self):
+        for cursor in ('bukan-cursor', 'MjAyNC0wMi0zMHwx'):
+            response = self.client.get('/api/transaksi-pengambilan/getall', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertIn('cursor', response.data)
+
+
+class StockLedgerTest(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user('admin', password='rahasia')
+        admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.product = Product.objects.create(nama='Roti Tawar', foto_product='https://contoh.id/roti.png')
+
+    def ledger(self):
+        return list(StockMovement.objects.order_by('id').values_list('reason', 'delta', 'source_id'))
+
+    def test_penulisan_stok_tercatat(self):
+        response = self.client.post('/api/stock/', {'product_id': self.product.id, 'quantity': 10}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.put(f'/api/stock/{self.product.id}', {'product_id': self.product.id, 'quantity': 7},
+                                   format='json')
+        self.assertEqual(response.status_code, 200)
+
+        sales = User.objects.create_user('sales', password='rahasia')
+        sales.groups.add(Group.objects.create(name='sales'))
+        Harga.objects.create(product=self.product, tipe_harga='Harga ke toko', harga=5000)
+        self.client.force_authenticate(sales)
+        response = self.client.post('/api/transaksi-pengambilan/', {
+            'jalur': Jalur.objects.create(nama='Jalur 1').id,
+            'items': [{'product': self.product.id, 'quantity': 2, 'tipe_harga': 'Harga ke toko'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        transaksi = TransaksiPengambilan.objects.get()
+        self.assertEqual(self.ledger(), [('penyesuaian', 10, None), ('penyesuaian', -3, None),
+                                         ('pengambilan', -2, transaksi.id)])
+        self.assertEqual(Stock.objects.get().quantity, 5)
+
+    def test_rebuild_stock_memperbaiki_saldo(self):
+        Stock.objects.create(product_id=self.product, quantity=0)
+        apply_stock_deltas({self.product.id: 10}, 'saldo_awal')
+        apply_stock_deltas({self.product.id: -4}, 'pengambilan')
+        Stock.objects.update(quantity=999)
+
+        call_command('rebuild_stock', '--dry-run', stdout=StringIO())
+        self.assertEqual(Stock.objects.get().quantity, 999)
+        call_command('rebuild_stock', stdout=StringIO())
+        self.assertEqual(Stock.objects.get().quantity, 6)
+
+    def test_saldo_per_tanggal(self):
+        Stock.objects.create(product_id=self.product, quantity=0)
+        apply_stock_deltas({self.product.id: 10}, 'saldo_awal')
+        StockMovement.objects.update(created_at=timezone.now() - timedelta(days=2))
+        apply_stock_deltas({self.product.id: -4}, 'pengambilan')
+
+        kemarin = timezone.localdate() - timedelta(days=1)
+        response = self.client.get('/api/stock/', {'per_tanggal': kemarin.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [{'product_id': self.product.id, 'quantity': 10}])
+        response = self.client.get('/api/stock/', {'per_tanggal': timezone.localdate().isoformat()})
+        self.assertEqual(response.data, [{'product_id': self.product.id, 'quantity': 6}])
+
+
+class RekapPiutangTest(TestCase):
+    def test_rekap_ikut_pembayaran(self):
+        pembayaran = buat_pembayaran(Decimal('100000'))
+        call_command('rebuild_rekap_piutang', stdout=StringIO())
+        self.assertEqual(RekapPiutang.objects.get().sisa, Decimal('100000'))
+
+        apply_payment(pembayaran.id, Decimal('40000'), 'cicil')
+        rekap = RekapPiutang.objects.get()
+        self.assertEqual((rekap.sisa, rekap.jumlah_transaksi), (Decimal('60000'), 1))
+
+        apply_payment(pembayaran.id, 0, 'pelunasan')
+        rekap = RekapPiutang.objects.get()
+        self.assertEqual((rekap.sisa, rekap.jumlah_transaksi), (0, 0))
+
+
+class RekapPenjualanTest(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user('admin', password='rahasia')
+        admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+        sales = User.objects.create_user('sales', password='rahasia')
+        jalur = Jalur.objects.create(nama='Jalur 1')
+        self.product = Product.objects.create(nama='Roti Tawar', foto_product='https://contoh.id/roti.png')
+        self.transaksi = TransaksiPengambilan.objects.create(user=sales, jalur=jalur)
+        for quantity, tipe_item in [(10, 'normal'), (2, 'retur')]:
+            subtotal = Decimal('5000') * quantity * (1 if tipe_item == 'normal' else -1)
+            ItemPengambilan.objects.create(transaksi=self.transaksi, product=self.product, quantity=quantity,
+                                           harga_satuan=5000, subtotal=subtotal, tipe_item=tipe_item)
+
+    def test_konfirmasi_mengisi_rekap(self):
+        self.client.post(f'/api/transaksi-pengambilan/{self.transaksi.id}/konfirmasi/')
+        hari_ini = self.transaksi.tanggal_pengambilan
+        response = self.client.get('/api/laporan/penjualan/', {'dari': hari_ini, 'sampai': hari_ini})
+        row = response.data['results'][0]
+        self.assertEqual((row['quantity_normal'], row['quantity_retur']), (10, 2))
+        self.assertEqual(row['total'], Decimal('40000'))
+
+        rekap = sorted(RekapPenjualanHarian.objects.values_list('tipe_item', 'quantity', 'subtotal'))
+        call_command('rekap_penjualan', stdout=StringIO())
+        self.assertEqual(rekap, sorted(RekapPenjualanHarian.objects.values_list('tipe_item', 'quantity', 'subtotal')))
+
+
+class HargaCacheTest(TestCase):
+    def test_harga_berubah_setelah_commit(self):
+        product = Product.objects.create(nama='Roti Tawar', foto_product='https://contoh.id/roti.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            harga = Harga.objects.create(product=product, tipe_harga='Harga ke toko', harga=5000)
+        self.assertEqual(get_harga(product.id, 'Harga ke toko'), Decimal('5000'))
+
+        with self.assertNumQueries(0):
+            get_harga(product.id, 'Harga ke toko')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            harga.harga = 6000
+            harga.save()
+        self.assertEqual(get_harga(product.id, 'Harga ke toko'), Decimal('6000'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            harga.delete()
+        self.assertIsNone(get_harga(product.id, 'Harga ke toko'))
+
+    def test_harga_terjadwal(self):
+        product = Product.objects.create(nama='Roti Tawar', foto_product='https://contoh.id/roti.png')
+        besok = timezone.now() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Harga.objects.create(product=product, tipe_harga='Harga ke toko', harga=5000)
+            RiwayatHarga.objects.create(product=product, tipe_harga='Harga ke toko', harga=5500, berlaku_mulai=besok)
+
+        self.assertEqual(get_harga(product.id, 'Harga ke toko'), Decimal('5000'))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_harga(product.id, 'Harga ke toko', besok), Decimal('5500'))
+
+    def test_jadwal_diterapkan_mengubah_updated_at(self):
+        product = Product.objects.create(nama='Roti Tawar', foto_product='https://contoh.id/roti.png')
+        harga = Harga.objects.create(product=product, tipe_harga='Harga ke toko', harga=5000)
+        RiwayatHarga.objects.create(product=product, tipe_harga='Harga ke toko', harga=5500,
+                                    berlaku_mulai=timezone.now())
+
+        self.assertEqual(terapkan_jadwal_harga(), 1)
+        diterapkan = Harga.objects.get(pk=harga.pk)
+        self.assertEqual(diterapkan.harga, Decimal('5500'))
+        self.assertGreater(diterapkan.updated_at, harga.updated_at)
+
+
+class HargaBulkTest(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user('admin', password='rahasia')
+        admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        for nama in ['Roti Tawar', 'Roti Manis']:
+            product = Product.objects.create(nama=nama, foto_product='https://contoh.id/roti.png')
+            Harga.objects.create(product=product, tipe_harga='Harga ke toko', harga=5000)
+
+    def test_persen_dry_run_lalu_simpan(self):
+        data = {'tipe_harga': 'Harga ke toko', 'persen': 10, 'dry_run': True}
+        response = self.client.post('/api/harga/bulk/', data, format='json')
+        self.assertEqual(response.data['jumlah'], 2)
+        self.assertEqual(Harga.objects.filter(harga=5000).count(), 2)
+
+        data['dry_run'] = False
+        self.client.post('/api/harga/bulk/', data, format='json')
+        self.assertEqual(Harga.objects.filter(harga=5500).count(), 2)
+        self.assertEqual(RiwayatHarga.objects.filter(harga=5500).count(), 2)
+
+
+class ProductImportTest(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user('admin', password='rahasia')
+        admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def test_import_json(self):
+        rows = [
+            {'nama': f'Roti {i}', 'foto_product': 'https://contoh.id/roti.png',
+             'harga_list': [{'tipe_harga': 'Harga ke toko', 'harga': 5000}]}
+            for i in range(50)
+        ]
+        response = self.client.post('/api/products/import/', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((Product.objects.count(), Stock.objects.count(), Harga.objects.count()), (50, 50, 50))
+
+    def test_error_per_baris_tanpa_menyimpan(self):
+        rows = [
+            {'nama': 'Roti Tawar', 'foto_product': 'https://contoh.id/roti.png',
+             'harga_list': [{'tipe_harga': 'Harga ke toko', 'harga': 5000}]},
+            {'nama': 'Roti Manis', 'foto_product': 'https://contoh.id/roti.png', 'harga_list': []},
+        ]
+        response = self.client.post('/api/products/import/', rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['baris'] for error in response.data['errors']], [2])
+        self.assertFalse(Product.objects.exists())
+
+
+class ProductListQueryTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('sales', password='rahasia'))
+
+    def buat_produk(self, jumlah):
+        products = Product.objects.bulk_create([
+            Product(nama=f'Roti {i}', foto_product='https://contoh.id/roti.png') for i in range(jumlah)
+        ])
+        Stock.objects.bulk_create([Stock(product_id=product, quantity=10) for product in products])
+        Harga.objects.bulk_create([
+            Harga(product=product, tipe_harga=tipe, harga=5000, is_delete=tipe == 'Harga Ecer')
+            for product in products
+            for tipe in ['Harga ke toko', 'Harga Ecer']
+        ])
+
+    def jumlah_query(self, params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_query_konstan(self):
+        self.buat_produk(10)
+        response, query_10 = self.jumlah_query()
+        self.buat_produk(990)
+        response, query_1000 = self.jumlah_query()
+
+        self.assertEqual(query_10, query_1000)
+        self.assertEqual(len(response.data), 1000)
+        self.assertEqual([harga['tipe_harga'] for harga in response.data[0]['harga_list']], ['Harga ke toko'])
+        self.assertEqual(response.data[0]['stock']['quantity'], 10)
+
+    def test_sparse_fields(self):
+        self.buat_produk(10)
+        response, query_penuh = self.jumlah_query()
+        response, query_ringan = self.jumlah_query({'fields': 'id,nama'})
+        self.assertEqual(set(response.data[0]), {'id', 'nama'})
+        self.assertLess(query_ringan, query_penuh)
+
+        response = self.client.get('/api/products/', {'fields': 'id,rahasia'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_header_dan_budget_query(self):
+        self.buat_produk(10)
+        response, jumlah = self.jumlah_query()
+        self.assertEqual(response['X-Query-Count'], str(jumlah))
+
+        cache.clear()
+        with override_settings(QUERY_BUDGETS={'product-list': jumlah - 1}, QUERY_BUDGET_STRICT=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/products/')
+
+    def test_slow_query_tercatat(self):
+        self.buat_produk(3)
+        slow_queries.clear()
+        cache.clear()
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0):
+            self.client.get('/api/products/')
+        entry = slow_queries.entries()[0]
+        self.assertEqual(entry['endpoint'], 'product-list')
+        self.assertTrue(entry['lokasi'].startswith('product/'))
+
+        jumlah = len(slow_queries.entries())
+        cache.clear()
+        self.client.get('/api/products/')
+        self.assertEqual(len(slow_queries.entries()), jumlah)
+
+    def test_explain_tidak_dihitung(self):
+        self.buat_produk(3)
+        response, jumlah = self.jumlah_query()
+        slow_queries.clear()
+        cache.clear()
+        # Vendor dipalsukan agar jalur EXPLAIN + savepoint ikut jalan (EXPLAIN-nya gagal di SQLite)
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN_SAMPLE=1), \
+                mock.patch.object(connections['default'], 'vendor', 'postgresql'):
+            response = self.client.get('/api/products/')
+        self.assertEqual(response['X-Query-Count'], str(jumlah))
+        self.assertTrue(any(entry['plan'] for entry in slow_queries.entries()))
+
+
+class SeedBakeryTest(TestCase):
+    def test_seed_kecil(self):
+        call_command('seed_bakery', products=20, jalur=4, toko_per_jalur=2, sales=2, hari=3,
+                     transaksi_per_hari=3, item_per_transaksi=2, stdout=StringIO())
+        self.assertEqual(Harga.objects.count(), 20 * len(Harga.TIPE_HARGA_CHOICES))
+        self.assertEqual(TransaksiPengambilan.objects.count(), 4 * 3)
+        self.assertEqual(TransaksiPengambilan.objects.filter(is_konfirmasi=False).count(), 3)
+        self.assertEqual(
+            RekapPenjualanHarian.objects.aggregate(total=Sum('subtotal'))['total'],
+            ItemPengambilan.objects.filter(transaksi__is_konfirmasi=True).aggregate(total=Sum('subtotal'))['total'],
+        )
+
+
+class PembayaranParalelTest(TransactionTestCase):
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_50_pembayaran_paralel(self):
+        pembayaran = buat_pembayaran(Decimal('1000000'))
+
+        def bayar(_):
+            try:
+                apply_payment(pembayaran.id, Decimal('1000'), 'bayar')
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            list(executor.map(bayar, range(50)))
+
+        pembayaran.refresh_from_db()
+        self.assertEqual(pembayaran.jumlah_dibayar, Decimal('50000'))
+        self.assertEqual(pembayaran.kekurangan_bayar, Decimal('950000'))
+        self.assertEqual(pembayaran.entries.count(), 50)
+
+
+class Deadlock(Exception):
+    pgcode = '40P01'
+
+
+class StockLockTest(TransactionTestCase):
+    def setUp(self):
+        admin = User.objects.create_user('admin', password='rahasia')
+        admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.suplier = Suplier.objects.create(pt='PT Tepung', nama='Budi', alamat='Pasar', telepon='0800')
+        self.products = [
+            Product.objects.create(nama=f'Roti {i}', foto_product='https://contoh.id/roti.png') for i in range(3)
+        ]
+
+    def test_lock_satu_query_urut_product(self):
+        Stock.objects.bulk_create([Stock(product_id=product, quantity=10) for product in self.products])
+        product_ids = [product.id for product in reversed(self.products)]
+        with CaptureQueriesContext(connection) as context:
+            stocks = lock_stocks(product_ids)
+        self.assertEqual(len(context.captured_queries), 1)
+        sql = context.captured_queries[0]['sql']
+        self.assertIn('ORDER BY "product_stock"."product_id_id" ASC', sql)
+        if connection.features.has_select_for_update:
+            self.assertIn('FOR UPDATE', sql)
+        self.assertEqual(list(stocks), sorted(product_ids))
+
+    def test_retry_setelah_deadlock(self):
+        error = OperationalError('deadlock detected')
+        error.__cause__ = Deadlock()
+        percobaan = []
+
+        def lock_gagal_sekali(product_ids):
+            percobaan.append(product_ids)
+            if len(percobaan) == 1:
+                raise error
+            return lock_stocks(product_ids)
+
+        with mock.patch('product.serializers.lock_stocks', side_effect=lock_gagal_sekali):
+            data = {'suplier': self.suplier.id, 'total_belanja': '15000', 'items': [
+                {'product': product.id, 'jumlah_belanja': '5000', 'quantity': 4} for product in self.products
+            ]}
+            response = self.client.post('/api/belanja/', data, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(percobaan), 2)
+        self.assertEqual(Belanja.objects.count(), 1)
+        self.assertEqual(sorted(Stock.objects.values_list('quantity', flat=True)), [4, 4, 4])
@@ -5,6 +5,7 @@ from .views import *
 router = DefaultRouter()
 router.register(r'products', ProductViewSet, basename='product')
 router.register(r'harga', HargaViewSet, basename='harga')
+router.register(r'riwayat-harga', RiwayatHargaViewSet, basename='riwayat-harga')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -17,8 +18,13 @@ urlpatterns = [
     
     path('products-count/', product_count, name='product-count'),
     path('suplier-count/', suplier_count, name='suplier-count'),
+    path('dashboard/summary', dashboard_summary, name='dashboard-summary'),
+    path('sync', SyncView.as_view(), name='sync'),
+    path('laporan/piutang-aging/', AgingPiutangView.as_view(), name='laporan-piutang-aging'),
+    path('laporan/penjualan/', LaporanPenjualanView.as_view(), name='laporan-penjualan'),
     
     path('transaksi-pengambilan/', TransaksiPengambilanAPIView.as_view(), name='transaksi-pengambilan'),
+    path('transaksi-pengambilan/batch/', BatchTransaksiPengambilanAPIView.as_view(), name='batch-transaksi-pengambilan'),
     path('transaksi-pengambilan/getall', TransaksiPengambilanListView.as_view(), name='transaksi-pengambilan-all'),
     path('transaksi-pengambilan/<int:pk>/konfirmasi/', KonfirmasiTransaksiPengambilanAPIView.as_view(), name='konfirmasi-transaksi-pengambilan'),
     path('transaksi-pengambilan/<int:pk>/', TransaksiPengambilanUpdateView.as_view(), name='edit-transaksi-pengambilan'),
@@ -27,5 +33,8 @@ urlpatterns = [
     path('transaksi-pembayaran/', BayarAPIView.as_view(), name='bayar'),
     path('transaksi-pelunasan/', PelunasanView.as_view(), name='pelunasan'),
     path('transaksi-cicil/', CicilPembayaranView.as_view(), name='cicil'),
+
+    path('export/transaksi-pengambilan/', ExportTransaksiPengambilanView.as_view(), name='export-transaksi-pengambilan'),
+    path('export/transaksi-pembayaran/', ExportTransaksiPembayaranView.as_view(), name='export-transaksi-pembayaran'),
 ]
   
\ No newline at end of file
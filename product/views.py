@@ -1,16 +1,36 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from .models import ItemPengambilan, Product, Harga, Stock, Suplier, ProductInSuplier, Belanja, TransaksiPengambilan, TransaksiPembayaran
+from .models import ItemPengambilan, Product, Harga, RiwayatHarga, Stock, Suplier, ProductInSuplier, Belanja, ItemBelanja, TransaksiPengambilan, TransaksiPembayaran
 from .serializers import *
 from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 from django.shortcuts import get_object_or_404
 from rest_framework.generics import UpdateAPIView
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
 from django.db.models import Prefetch
-from django.db import transaction
+from django.db import transaction, IntegrityError
+from rest_framework import serializers
 from rest_framework.permissions import IsAuthenticated
+from user.permissions import IsAdminRole, is_admin, is_sales
+from user.authentication import StatelessJWTAuthentication
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime
+from .services import stock_as_of, apply_payment
+from .dashboard import get_summary
+from .laporan import aging_piutang, AGING_BUCKETS, catat_penjualan, laporan_penjualan, LAPORAN_GROUP, LAPORAN_PERIODE
+from .pricing import cache_stats, invalidate_harga, simpan_harga_massal
+from .catalog import get_catalog_version, get_catalog, catalog_etag, etag_match
+from .pagination import KeysetPagination
+from .sync import build_sync, decode_token
+from toko.models import Jalur
+from .exports import (PENGAMBILAN_FIELDS, PEMBAYARAN_FIELDS, pengambilan_rows,
+                      pembayaran_rows, stream_csv, stream_ndjson)
+from django.http import StreamingHttpResponse
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from .imports import MAX_ROWS, parse_csv, validate_rows, import_products
+import csv
 
 
 @api_view(['GET'])
@@ -21,9 +41,18 @@ def product_count(request):
 def suplier_count(request):
     count = Suplier.objects.count()
     return Response({'count': count})
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_summary(request):
+    """Semua counter dashboard dalam satu request, dilayani dari cache."""
+    if is_admin(request):
+        return Response(get_summary())
+    return Response(get_summary(request.user))
 class ProductViewSet(viewsets.ModelViewSet):
+    # Katalog dibaca sangat sering: user cukup dibangun dari claim token
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated]
-    queryset = Product.objects.filter(is_delete=False).prefetch_related('harga_list')
+    queryset = Product.objects.filter(is_delete=False)
     serializer_class = ProductSerializer
     
     def get_permissions(self):
@@ -33,45 +62,112 @@ class ProductViewSet(viewsets.ModelViewSet):
         """
         if self.action in ["list", "retrieve"]:
             return [IsAuthenticated()]
-        if self.request.user.groups.filter(name="admin").exists():
-            return [IsAuthenticated()]
-        return []
+        return [IsAuthenticated(), IsAdminRole()]
+
+    def get_fields(self):
+        """Field yang diminta lewat ?fields=a,b (list & retrieve), None berarti semua."""
+        param = self.request.query_params.get('fields') if self.action in ["list", "retrieve"] else None
+        if not param:
+            return None
+        fields = sorted({name.strip() for name in param.split(',') if name.strip()})
+        tidak_dikenal = set(fields) - set(ProductSerializer.Meta.fields)
+        if tidak_dikenal:
+            raise serializers.ValidationError(
+                {"fields": f"Field tidak dikenal: {', '.join(sorted(tidak_dikenal))}. "
+                           f"Pilihan: {', '.join(ProductSerializer.Meta.fields)}."}
+            )
+        return fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_fields()
+        # Stock lewat JOIN, harga aktif saja dalam satu query prefetch
+        if fields is None or 'stock' in fields:
+            queryset = queryset.select_related('stock')
+        if fields is None or 'harga_list' in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch('harga_list', queryset=Harga.objects.filter(is_delete=False))
+            )
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Katalog di-cache per versi (naik setiap ada perubahan Product/Harga/Stock)
+        dan per pilihan ?fields=. Client yang mengirim If-None-Match dengan
+        ETag terbaru mendapat 304.
+        """
+        fields = self.get_fields()
+        variant = f":{','.join(fields)}" if fields else ''
+        version = get_catalog_version()
+        etag = catalog_etag(version, variant)
+        if etag_match(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        data = get_catalog(version, lambda: super(ProductViewSet, self).list(request, *args, **kwargs).data, variant)
+        return Response(data, headers={'ETag': etag})
     
+    @action(detail=False, methods=['post'], url_path='import',
+            parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def bulk_import(self, request):
+        """
+        Import produk massal dari JSON (list produk seperti POST /products/)
+        atau upload CSV di field `file`. Semua baris divalidasi dulu; jika ada
+        yang gagal tidak ada yang disimpan dan error dikembalikan per baris.
+        """
+        if 'file' in request.FILES:
+            try:
+                rows = parse_csv(request.FILES['file'])
+            except (UnicodeDecodeError, csv.Error):
+                return Response({"detail": "File CSV tidak dapat dibaca."}, status=status.HTTP_400_BAD_REQUEST)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            return Response({"detail": "Kirim list produk (JSON) atau file CSV."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not rows:
+            return Response({"detail": "Tidak ada produk untuk diimport."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > MAX_ROWS:
+            return Response({"detail": f"Maksimal {MAX_ROWS} produk per import."}, status=status.HTTP_400_BAD_REQUEST)
+
+        valid, errors = validate_rows(rows)
+        if errors:
+            return Response({"jumlah_error": len(errors), "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        products = import_products(valid)
+        return Response({
+            "jumlah": len(products),
+            "results": [{"id": product.id, "nama": product.nama} for product in products],
+        }, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'], url_path='add-harga')
     def add_harga(self, request, pk=None):
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk menambah harga."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         product = self.get_object()
         serializer = HargaProductSerializer(data=request.data)
         if serializer.is_valid():
             tipe_harga_baru = serializer.validated_data['tipe_harga']
-            if product.harga_list.filter(tipe_harga=tipe_harga_baru).exists():
+            # Query langsung: harga_list hasil get_object() hanya berisi harga aktif
+            harga = Harga.objects.filter(product=product, tipe_harga=tipe_harga_baru).first()
+            if harga is not None and not harga.is_delete:
                 return Response(
                     {"detail": f"Tipe harga '{tipe_harga_baru}' sudah ada untuk produk ini."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            if harga is not None:
+                # Harga yang pernah di-soft delete dipakai lagi (unik per product & tipe_harga)
+                harga.harga = serializer.validated_data['harga']
+                harga.is_delete = False
+                harga.save()
+                return Response(HargaProductSerializer(harga).data, status=status.HTTP_201_CREATED)
             serializer.save(product=product)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    def partial_update(self, request, *args, **kwargs):
-        """Hanya admin yang boleh edit produk (PATCH)"""
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk mengedit produk."},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        return super().partial_update(request, *args, **kwargs)
     def destroy(self, request, *args, **kwargs):
         """Soft delete: ubah is_delete menjadi True"""
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk menghapus produk."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         instance = self.get_object()
         instance.is_delete = True
         instance.save()
@@ -82,14 +178,121 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     
 class HargaViewSet(viewsets.ModelViewSet):
-    queryset = Harga.objects.all().order_by('-id')
+    queryset = Harga.objects.filter(is_delete=False).order_by('-id')
     serializer_class = HargaSerializer
+
+    def destroy(self, request, *args, **kwargs):
+        """Soft delete supaya penghapusan ikut terkirim di sync delta"""
+        instance = self.get_object()
+        instance.is_delete = True
+        instance.save()
+        return Response(
+            {"detail": "Harga berhasil dihapus (soft delete)"},
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=['post'], url_path='bulk',
+            permission_classes=[IsAuthenticated, IsAdminRole])
+    def bulk(self, request):
+        """
+        Ubah banyak harga dalam satu transaksi. dry_run=true hanya
+        mengembalikan diff tanpa menyimpan.
+        """
+        serializer = HargaBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        dry_run = serializer.validated_data['dry_run']
+        with transaction.atomic():
+            perubahan = serializer.perubahan()
+            if not dry_run:
+                simpan_harga_massal(perubahan, serializer.validated_data.get('berlaku_mulai'))
+        return Response({
+            'dry_run': dry_run,
+            'berlaku_mulai': serializer.validated_data.get('berlaku_mulai'),
+            'jumlah': len(perubahan),
+            'perubahan': [{k: v for k, v in row.items() if k != 'id'} for row in perubahan],
+        })
+
+    @action(detail=False, methods=['get'], url_path='cache-stats',
+            permission_classes=[IsAuthenticated, IsAdminRole])
+    def cache_stats(self, request):
+        """Counter hit/miss cache tabel harga di worker ini."""
+        return Response(cache_stats())
+
+
+class RiwayatHargaViewSet(viewsets.ModelViewSet):
+    """
+    Riwayat & jadwal perubahan harga. POST menerima satu objek atau list
+    (untuk menyiapkan re-pricing massal). Hanya jadwal yang belum berlaku
+    yang boleh dihapus. Filter: ?product=, ?tipe_harga=, ?terjadwal=true.
+    """
+    serializer_class = RiwayatHargaSerializer
+    permission_classes = [IsAuthenticated, IsAdminRole]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
+    def get_queryset(self):
+        queryset = RiwayatHarga.objects.select_related('product').order_by('-berlaku_mulai', '-id')
+        params = self.request.query_params
+        if params.get('product'):
+            queryset = queryset.filter(product_id=params['product'])
+        if params.get('tipe_harga'):
+            queryset = queryset.filter(tipe_harga=params['tipe_harga'])
+        if params.get('terjadwal', '').lower() == 'true':
+            queryset = queryset.filter(berlaku_mulai__gt=timezone.now())
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        many = isinstance(request.data, list)
+        serializer = self.get_serializer(data=request.data, many=many)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            if many:
+                riwayat = RiwayatHarga.objects.bulk_create(
+                    [RiwayatHarga(**data) for data in serializer.validated_data]
+                )
+                # bulk_create tidak memicu signal
+                invalidate_harga()
+                serializer = self.get_serializer(riwayat, many=True)
+            else:
+                serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        if instance.berlaku_mulai <= timezone.now():
+            return Response({"detail": "Harga yang sudah berlaku tidak dapat dihapus dari riwayat."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        instance.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
     
     
+def parse_tanggal(params, param):
+    """Tanggal YYYY-MM-DD dari query param, None bila kosong. Tanggal tidak valid menjadi error 400."""
+    value = params.get(param)
+    if not value:
+        return None
+    try:
+        tanggal = parse_date(value)
+    except ValueError:
+        # Format benar tapi tanggalnya tidak ada, mis. 2024-02-30
+        tanggal = None
+    if tanggal is None:
+        raise serializers.ValidationError({param: f"Format {param} harus YYYY-MM-DD."})
+    return tanggal
+
+
 class StockList(APIView):
     @swagger_auto_schema(responses={200: StockSerializer(many=True)})
     def get(self, request):
-        stocks = Stock.objects.all().order_by('-id')
+        tanggal = parse_tanggal(request.query_params, 'per_tanggal')
+        if tanggal:
+            # Saldo stok pada akhir tanggal tertentu, dihitung dari ledger
+            waktu = timezone.make_aware(datetime.combine(tanggal, datetime.max.time()))
+            saldo = stock_as_of(waktu)
+            return Response([
+                {'product_id': product_id, 'quantity': quantity}
+                for product_id, quantity in sorted(saldo.items())
+            ])
+        stocks = Stock.objects.all().order_by('-product_id')
         serializer = StockSerializer(stocks, many=True)
         return Response(serializer.data)
     
@@ -101,7 +304,7 @@ class StockList(APIView):
         except Product.DoesNotExist:
             return Response({"detail": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
         if serializer.is_valid():
-            if product.stock is None:
+            if not Stock.objects.filter(product_id=product).exists():
                 serializer.save()
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response({"detail": "Stock sudah ada"}, status=status.HTTP_400_BAD_REQUEST)
@@ -122,25 +325,15 @@ class StockDetail(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 class SuplierList(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAdminRole]
     
     @swagger_auto_schema(responses={200: SuplierSerializer(many=True)})
     def get(self, request):
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk akses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         supliers = Suplier.objects.all().order_by('-id')
         serializer = SuplierSerializer(supliers, many=True)
         return Response(serializer.data)
     
     def post(self, request):
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk akses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         serializer = SuplierSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -148,11 +341,6 @@ class SuplierList(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def put(self, request, pk=None):
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk akses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         try:
             suplier = Suplier.objects.get(pk=pk)
         except Suplier.DoesNotExist:
@@ -168,25 +356,15 @@ class SuplierUpdateView(UpdateAPIView):
     serializer_class = SuplierSerializer
     
 class ProsuctInSuplierView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAdminRole]
     
     @swagger_auto_schema(responses={200: ProductInSuplierSerializer(many=True)})
     def get(self, request):
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk akses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         product_in_suplier = ProductInSuplier.objects.all()
         serializer = ProductInSuplierSerializer(product_in_suplier, many=True)
         return Response(serializer.data)
     
     def post(self, request):
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk akses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         serializer = ProductInSuplierSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -194,21 +372,11 @@ class ProsuctInSuplierView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def destroy(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk akses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         product = self.get_object()
         product.delete()
         return Response({"detail": "Produk berhasil dihapus."}, status=status.HTTP_204_NO_CONTENT)
     
     def patch(self, request, pk=None):
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk akses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         try:
             product = ProductInSuplier.objects.get(pk=pk)
         except ProductInSuplier.DoesNotExist:
@@ -219,40 +387,29 @@ class ProsuctInSuplierView(APIView):
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+def belanja_queryset():
+    return Belanja.objects.prefetch_related(Prefetch('items', queryset=ItemBelanja.objects.select_related('product')))
+
+
 class BelanjaView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAdminRole]
     
     @swagger_auto_schema(responses={200: BelanjaSerializer(many=True)})
     def get(self, request):
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk akses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        belanja_list = Belanja.objects.all().order_by('-id')
+        belanja_list = belanja_queryset().order_by('-id')
         serializer = BelanjaSerializer(belanja_list, many=True)
         return Response(serializer.data)
 
     @swagger_auto_schema(request_body=BelanjaSerializer, responses={201: BelanjaSerializer})
     def post(self, request):
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk akses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         serializer = BelanjaSerializer(data=request.data)
         if serializer.is_valid():
             belanja = serializer.save()
-            return Response(BelanjaSerializer(belanja).data, status=status.HTTP_201_CREATED)
+            return Response(BelanjaSerializer(belanja_queryset().get(pk=belanja.pk)).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @swagger_auto_schema(request_body=BelanjaSerializer, responses={200: BelanjaSerializer})
     def put(self, request, pk=None):
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk akses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         try:
             belanja = Belanja.objects.get(pk=pk)
         except Belanja.DoesNotExist:
@@ -260,26 +417,56 @@ class BelanjaView(APIView):
 
         serializer = BelanjaSerializer(belanja, data=request.data)
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
+            belanja = serializer.save()
+            return Response(BelanjaSerializer(belanja_queryset().get(pk=belanja.pk)).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
  
+def get_transaksi_detail(pk):
+    return TransaksiPengambilan.objects.select_related('user', 'jalur').prefetch_related(
+        Prefetch('items', queryset=ItemPengambilan.objects.select_related('product'))
+    ).get(pk=pk)
+
+
 class TransaksiPengambilanAPIView(APIView):
     permission_classes = [IsAuthenticated]
     def post(self, request):
+        # Kiriman ulang dengan idempotency_key yang sama mengembalikan transaksi lama
+        key = request.data.get('idempotency_key')
+        if key:
+            existing = TransaksiPengambilan.objects.filter(idempotency_key=key).first()
+            if existing:
+                return self.respon_duplikat(request, existing)
+
         serializer = TransaksiPengambilanSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            transaksi = serializer.save()
-            response_data = TransaksiPengambilanDetailSerializer(transaksi).data
+            try:
+                transaksi = serializer.save()
+            except IntegrityError:
+                # Kiriman ulang paralel dengan key yang sama baru saja disimpan request lain
+                existing = TransaksiPengambilan.objects.filter(idempotency_key=key).first() if key else None
+                if existing is None:
+                    raise
+                return self.respon_duplikat(request, existing)
+            response_data = TransaksiPengambilanDetailSerializer(get_transaksi_detail(transaksi.pk)).data
             return Response({
                 'status': True,
                 'message': 'Transaksi pengambilan berhasil dibuat.',
                 'data': response_data
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def respon_duplikat(self, request, existing):
+        if existing.user_id != request.user.id:
+            return Response({"idempotency_key": ["idempotency_key sudah dipakai user lain."]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'status': True,
+            'message': 'Transaksi pengambilan sudah pernah dibuat.',
+            'data': TransaksiPengambilanDetailSerializer(get_transaksi_detail(existing.pk)).data
+        }, status=status.HTTP_200_OK)
     
     def put(self, request, pk):
-        if not request.user.groups.filter(name="admin").exists():
+        if not is_admin(request):
             return Response(
                 {"detail": "Anda tidak memiliki izin untuk menambah transaksi pengambilan."},
                 status=status.HTTP_403_FORBIDDEN
@@ -297,45 +484,125 @@ class TransaksiPengambilanAPIView(APIView):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+class BatchTransaksiPengambilanAPIView(APIView):
+    """
+    Upload banyak transaksi pengambilan sekaligus (antrian offline device sales).
+    Setiap dokumen diproses dalam transaksinya sendiri dan wajib membawa
+    idempotency_key; dokumen yang key-nya sudah tersimpan tidak dibuat ulang.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        batch = BatchTransaksiPengambilanSerializer(data=request.data)
+        if not batch.is_valid():
+            return Response(batch.errors, status=status.HTTP_400_BAD_REQUEST)
+        docs = batch.validated_data['transaksi']
+
+        # key -> (user_id, transaksi_id) untuk key yang sudah tersimpan
+        existing = {
+            key: (user_id, transaksi_id)
+            for key, user_id, transaksi_id in TransaksiPengambilan.objects.filter(
+                idempotency_key__in=[doc['idempotency_key'] for doc in docs]
+            ).values_list('idempotency_key', 'user_id', 'id')
+        }
+
+        results = []
+        for doc in docs:
+            key = doc['idempotency_key']
+            if key not in existing:
+                serializer = TransaksiPengambilanSerializer(data=doc, context={'request': request})
+                if not serializer.is_valid():
+                    results.append({'idempotency_key': key, 'status': 'gagal', 'errors': serializer.errors})
+                    continue
+                try:
+                    transaksi = serializer.save()
+                except serializers.ValidationError as exc:
+                    results.append({'idempotency_key': key, 'status': 'gagal', 'errors': exc.detail})
+                    continue
+                except IntegrityError:
+                    # Key yang sama baru saja disimpan oleh request lain
+                    transaksi = TransaksiPengambilan.objects.filter(idempotency_key=key).first()
+                    if transaksi is None:
+                        raise
+                    existing[key] = (transaksi.user_id, transaksi.id)
+                else:
+                    existing[key] = (transaksi.user_id, transaksi.id)
+                    results.append({'idempotency_key': key, 'status': 'dibuat', 'id': transaksi.id})
+                    continue
+
+            user_id, transaksi_id = existing[key]
+            if user_id != request.user.id:
+                results.append({'idempotency_key': key, 'status': 'gagal',
+                                'errors': ["idempotency_key sudah dipakai user lain."]})
+            else:
+                results.append({'idempotency_key': key, 'status': 'duplikat', 'id': transaksi_id})
+
+        return Response({'status': True, 'results': results}, status=status.HTTP_200_OK)
+
+
 class TransaksiPengambilanListView(APIView):
+    """
+    Riwayat transaksi pengambilan dengan keyset pagination (?cursor=, ?page_size=)
+    dan filter ?tanggal_dari=, ?tanggal_sampai=, ?jalur=, ?sales= (admin), ?is_konfirmasi=.
+    """
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
     def get(self, request):
-        if request.user.groups.filter(name__in=["admin"]).exists():
-            queryset = TransaksiPengambilan.objects.all().select_related('user', 'jalur').prefetch_related(
-                Prefetch('items', queryset=ItemPengambilan.objects.select_related('product'))
-            ).order_by('-id')
-        elif request.user.groups.filter(name__in=["sales"]).exists():
-            queryset = TransaksiPengambilan.objects.filter(user=request.user).select_related('user', 'jalur').prefetch_related(
-                Prefetch('items', queryset=ItemPengambilan.objects.select_related('product'))
-            ).order_by('-id')
+        if is_admin(request):
+            queryset = TransaksiPengambilan.objects.all()
+            sales = request.query_params.get('sales')
+            if sales:
+                if not sales.isdigit():
+                    return Response({"detail": "sales harus berupa id user."}, status=status.HTTP_400_BAD_REQUEST)
+                queryset = queryset.filter(user_id=sales)
+        elif is_sales(request):
+            queryset = TransaksiPengambilan.objects.filter(user=request.user)
         else:
             return Response(
                 {"detail": "Anda tidak memiliki izin untuk mengakses data ini."},
                 status=status.HTTP_403_FORBIDDEN
             )
-        serializer = TransaksiPengambilanReadSerializer(queryset, many=True)
-        return Response(serializer.data)
+
+        params = request.query_params
+        for param, lookup in (('tanggal_dari', 'tanggal_pengambilan__gte'), ('tanggal_sampai', 'tanggal_pengambilan__lte')):
+            tanggal = parse_tanggal(params, param)
+            if tanggal:
+                queryset = queryset.filter(**{lookup: tanggal})
+        if params.get('jalur'):
+            if not params['jalur'].isdigit():
+                return Response({"detail": "jalur harus berupa id jalur."}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(jalur_id=params['jalur'])
+        if params.get('is_konfirmasi'):
+            if params['is_konfirmasi'].lower() not in ('true', 'false'):
+                return Response({"detail": "is_konfirmasi harus true atau false."}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(is_konfirmasi=params['is_konfirmasi'].lower() == 'true')
+
+        queryset = queryset.select_related('user', 'jalur').prefetch_related(
+            Prefetch('items', queryset=ItemPengambilan.objects.select_related('product'))
+        )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = TransaksiPengambilanReadSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 class KonfirmasiTransaksiPengambilanAPIView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAdminRole]
     
     def post(self, request, pk):
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk menambah transaksi pengambilan."},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        transaksi = get_object_or_404(TransaksiPengambilan, pk=pk)
+        with transaction.atomic():
+            transaksi = get_object_or_404(TransaksiPengambilan.objects.select_for_update(), pk=pk)
 
-        if transaksi.is_konfirmasi:
-            return Response({
-                "status": False,
-                "message": "Transaksi sudah dikonfirmasi sebelumnya.",
-                "data": TransaksiPengambilanDetailSerializer(transaksi).data
-            }, status=status.HTTP_400_BAD_REQUEST)
+            if transaksi.is_konfirmasi:
+                return Response({
+                    "status": False,
+                    "message": "Transaksi sudah dikonfirmasi sebelumnya.",
+                    "data": TransaksiPengambilanDetailSerializer(transaksi).data
+                }, status=status.HTTP_400_BAD_REQUEST)
 
-        transaksi.is_konfirmasi = True
-        transaksi.save()
+            transaksi.is_konfirmasi = True
+            transaksi.save()
+            catat_penjualan(transaksi)
 
         return Response({
             "status": True,
@@ -361,7 +628,7 @@ class TransaksiPengambilanUpdateView(APIView):
     
 class BayarAPIView(APIView):
     def post(self, request):
-        serializer = BayarSerializer(data=request.data)
+        serializer = BayarSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             pembayaran = serializer.save()
             return Response(TransaksiPembayaranSerializer(pembayaran).data, status=status.HTTP_200_OK)
@@ -372,23 +639,18 @@ class PelunasanView(APIView):
         pembayaran_id = request.data.get("pembayaran_id")
         pembayaran = get_object_or_404(TransaksiPembayaran, id=pembayaran_id)
 
-        # hitung sisa kekurangan
-        sisa = pembayaran.total_pengambilan - pembayaran.jumlah_dibayar
-
-        if sisa <= 0:
-            return Response({"detail": "Pembayaran sudah lunas"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # langsung lunasi
-        pembayaran.jumlah_dibayar = pembayaran.total_pengambilan
-        pembayaran.kekurangan_bayar = 0
-        pembayaran.status_pembayaran = "lunas"
-        pembayaran.save()
+        # langsung lunasi seluruh sisa (dihitung ulang dengan baris terkunci)
+        try:
+            pembayaran = apply_payment(pembayaran.id, None, 'pelunasan',
+                                       user=request.user if request.user.is_authenticated else None)
+        except serializers.ValidationError as exc:
+            return Response({"detail": exc.detail[0]}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(TransaksiPembayaranSerializer(pembayaran).data, status=status.HTTP_200_OK)
     
 class CicilPembayaranView(APIView):
     def post(self, request, *args, **kwargs):
-        serializer = CicilPembayaranSerializer(data=request.data)
+        serializer = CicilPembayaranSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             pembayaran = serializer.save()
             return Response({
@@ -398,4 +660,124 @@ class CicilPembayaranView(APIView):
                 "kekurangan_bayar": pembayaran.kekurangan_bayar,
                 "status_pembayaran": pembayaran.status_pembayaran,
             }, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ExportTransaksiView(APIView):
+    """
+    Export riwayat transaksi (satu baris per item) secara streaming.
+    ?output=ndjson (default) atau csv, filter ?tanggal_dari= & ?tanggal_sampai=.
+    """
+    permission_classes = [IsAuthenticated, IsAdminRole]
+    fields = None
+    nama_file = None
+
+    def get_rows(self, tanggal_dari, tanggal_sampai):
+        raise NotImplementedError
+
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in ('ndjson', 'csv'):
+            return Response({"detail": "output harus ndjson atau csv."}, status=status.HTTP_400_BAD_REQUEST)
+
+        tanggal_dari = parse_tanggal(request.query_params, 'tanggal_dari')
+        tanggal_sampai = parse_tanggal(request.query_params, 'tanggal_sampai')
+
+        rows = self.get_rows(tanggal_dari, tanggal_sampai)
+        if output == 'csv':
+            response = StreamingHttpResponse(stream_csv(self.fields, rows), content_type='text/csv')
+        else:
+            response = StreamingHttpResponse(stream_ndjson(self.fields, rows), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{self.nama_file}.{output}"'
+        return response
+
+
+class ExportTransaksiPengambilanView(ExportTransaksiView):
+    fields = PENGAMBILAN_FIELDS
+    nama_file = 'transaksi-pengambilan'
+
+    def get_rows(self, tanggal_dari, tanggal_sampai):
+        return pengambilan_rows(tanggal_dari, tanggal_sampai)
+
+
+class ExportTransaksiPembayaranView(ExportTransaksiView):
+    fields = PEMBAYARAN_FIELDS
+    nama_file = 'transaksi-pembayaran'
+
+    def get_rows(self, tanggal_dari, tanggal_sampai):
+        return pembayaran_rows(tanggal_dari, tanggal_sampai)
+
+
+class SyncView(APIView):
+    """
+    Delta sync untuk client offline: GET /api/sync?since=<token>.
+    Tanpa since -> sync penuh. Simpan 'token' dari response untuk sync berikutnya.
+    'jalur_ids' berisi semua jalur milik user saat ini; jalur yang baru
+    di-assign ikut terkirim beserta tokonya.
+    """
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        since = None
+        if request.query_params.get('since'):
+            since = decode_token(request.query_params['since'])
+            if since is None:
+                return Response({"detail": "Token sync tidak valid."}, status=status.HTTP_400_BAD_REQUEST)
+
+        jalur_ids = None
+        if not is_admin(request):
+            if not is_sales(request):
+                return Response(
+                    {"detail": "Anda tidak memiliki izin untuk mengakses data ini."},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            jalur_ids = list(Jalur.objects.filter(users__id=request.user.id).values_list('id', flat=True))
+
+        data = build_sync(since, jalur_ids)
+        data['jalur_ids'] = jalur_ids
+        return Response(data)
+
+
+class AgingPiutangView(APIView):
+    """Laporan umur piutang (0-7, 8-30, 31-60, >60 hari) per sales dan jalur."""
+    permission_classes = [IsAuthenticated, IsAdminRole]
+
+    def get(self, request):
+        rows = aging_piutang()
+        total = {nama: sum(row[nama] for row in rows) for nama, _, _ in AGING_BUCKETS}
+        total['total'] = sum(row['total'] for row in rows)
+        return Response({'tanggal': timezone.localdate(), 'total': total, 'results': rows})
+
+
+class LaporanPenjualanView(APIView):
+    """
+    Laporan penjualan dari RekapPenjualanHarian.
+    ?dari=&sampai= (wajib, YYYY-MM-DD), ?group=product|jalur|sales,
+    ?periode=harian|mingguan|bulanan (kosong = total rentang).
+    """
+    permission_classes = [IsAuthenticated, IsAdminRole]
+
+    def get(self, request):
+        params = request.query_params
+        dari = parse_tanggal(params, 'dari')
+        sampai = parse_tanggal(params, 'sampai')
+        if not dari or not sampai:
+            return Response({"detail": "Parameter dari dan sampai wajib diisi (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+        if dari > sampai:
+            return Response({"detail": "Tanggal dari tidak boleh setelah tanggal sampai."}, status=status.HTTP_400_BAD_REQUEST)
+
+        group = params.get('group', 'product')
+        if group not in LAPORAN_GROUP:
+            return Response({"detail": f"group harus salah satu dari: {', '.join(LAPORAN_GROUP)}."}, status=status.HTTP_400_BAD_REQUEST)
+        periode = params.get('periode') or None
+        if periode and periode not in LAPORAN_PERIODE:
+            return Response({"detail": f"periode harus salah satu dari: {', '.join(LAPORAN_PERIODE)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'dari': dari,
+            'sampai': sampai,
+            'group': group,
+            'periode': periode,
+            'results': laporan_penjualan(dari, sampai, group, periode),
+        })
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toko', '0006_jalur_users'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jalur',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='toko',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toko', '0007_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='toko',
+            index=models.Index(condition=models.Q(('is_delete', False)), fields=['jalur'], name='toko_aktif_jalur_idx'),
+        ),
+    ]
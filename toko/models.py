@@ -7,7 +7,7 @@ class Jalur(models.Model):
     users = models.ManyToManyField(User, related_name='jalur_list', blank=True)
     nama = models.CharField(max_length= 20)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     def __str__(self):
         return self.nama
 class Toko(models.Model):
@@ -18,6 +18,12 @@ class Toko(models.Model):
     is_pasar = models.BooleanField(default=False)
     is_delete = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     jalur = models.ForeignKey(Jalur, on_delete=models.CASCADE, related_name='toko_list')
+
+    class Meta:
+        indexes = [
+            # Prefetch toko aktif per jalur (TOKO_AKTIF_PREFETCH)
+            models.Index(fields=['jalur'], condition=models.Q(is_delete=False), name='toko_aktif_jalur_idx'),
+        ]
     
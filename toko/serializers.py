@@ -1,6 +1,11 @@
 from rest_framework import serializers
 from toko.models import Toko, Jalur
 from django.contrib.auth.models import User
+from django.db.models import Prefetch
+from django.utils import timezone
+
+# Prefetch toko aktif untuk JalurSerializer (hindari query per jalur)
+TOKO_AKTIF_PREFETCH = Prefetch('toko_list', queryset=Toko.objects.filter(is_delete=False).order_by('id'))
 
 class TokoSerializer(serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
@@ -32,7 +37,12 @@ class JalurSerializer(serializers.Serializer):
     toko_list =serializers.SerializerMethodField()
     
     def get_toko_list(self, obj):
-        return TokoSerializer(Toko.objects.filter(jalur=obj), many=True).data
+        # Pakai hasil prefetch (TOKO_AKTIF_PREFETCH) bila tersedia
+        if 'toko_list' in getattr(obj, '_prefetched_objects_cache', {}):
+            toko = obj.toko_list.all()
+        else:
+            toko = obj.toko_list.filter(is_delete=False).order_by('id')
+        return TokoSerializer(toko, many=True).data
     
     def create(self, validated_data):
          return Jalur.objects.create(**validated_data)
@@ -66,6 +76,8 @@ class AssignJalurM2MSerializer(serializers.Serializer):
         user = validated_data['user']
         jalur_list = validated_data['jalur_list']
         user.jalur_list.add(*jalur_list) 
+        # Perubahan relasi tidak mengubah updated_at, padahal sync delta membacanya
+        jalur_list.update(updated_at=timezone.now())
         return user
     
 class RemoveJalurFromUserSerializer(serializers.Serializer):
@@ -97,4 +109,5 @@ class RemoveJalurFromUserSerializer(serializers.Serializer):
         user = self.validated_data['user']
         jalur_list = self.validated_data['jalur_list']
         user.jalur_list.remove(*jalur_list)
+        jalur_list.update(updated_at=timezone.now())
         return user
\ No newline at end of file
@@ -1,3 +1,48 @@
+from django.contrib.auth.models import User, Group
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from toko.models import Jalur, Toko
+
+
+class JalurListQueryTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='rahasia')
+        self.admin.groups.add(Group.objects.create(name='admin'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def buat_jalur(self, jumlah):
+        for i in range(jumlah):
+            jalur = Jalur.objects.create(nama=f'Jalur {i}')
+            jalur.users.add(self.admin)
+            Toko.objects.create(nama=f'Toko {i}', alamat='Pasar', koordinat='0,0', telepon='0800', jalur=jalur)
+            Toko.objects.create(nama=f'Tutup {i}', alamat='Pasar', koordinat='0,0', telepon='0800', jalur=jalur, is_delete=True)
+
+    def test_jalur_list_query_konstan(self):
+        # role + jalur + prefetch toko
+        self.buat_jalur(1)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/jalur/')
+        self.assertEqual(len(response.data), 1)
+
+        self.buat_jalur(199)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/jalur/')
+        self.assertEqual(len(response.data), 200)
+
+    def test_user_jalur_query_konstan(self):
+        # user + jalur + prefetch toko
+        self.buat_jalur(1)
+        with self.assertNumQueries(3):
+            self.client.get(f'/api/jalur/user/{self.admin.id}/')
+
+        self.buat_jalur(199)
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/jalur/user/{self.admin.id}/')
+        self.assertEqual(len(response.data), 200)
+
+    def test_toko_terhapus_tidak_ditampilkan(self):
+        self.buat_jalur(1)
+        response = self.client.get('/api/jalur/')
+        self.assertEqual([toko['nama'] for toko in response.data[0]['toko_list']], ['Toko 0'])
@@ -1,11 +1,12 @@
 from toko.models import Toko, Jalur
 from rest_framework.response import Response
-from toko.serializers import TokoSerializer, JalurSerializer, AssignJalurM2MSerializer, RemoveJalurFromUserSerializer
+from toko.serializers import TokoSerializer, JalurSerializer, AssignJalurM2MSerializer, RemoveJalurFromUserSerializer, TOKO_AKTIF_PREFETCH
 from rest_framework.views import APIView
 from rest_framework import status
 from django.http import Http404
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.permissions import IsAuthenticated
+from user.permissions import IsAdminRole, is_admin, is_sales
 from rest_framework.decorators import api_view, permission_classes
 from django.contrib.auth.models import User
 
@@ -37,7 +38,7 @@ class TokoDetail(APIView):
             raise Http404
 
     def get(self, request, toko_id):
-        if not request.user.groups.filter(name__in=["admin", "sales"]).exists():
+        if not (is_admin(request) or is_sales(request)):
             return Response(
                 {"detail": "Anda tidak memiliki izin untuk mengakses data ini."},
                 status=status.HTTP_403_FORBIDDEN
@@ -48,7 +49,7 @@ class TokoDetail(APIView):
 
     @swagger_auto_schema(request_body=TokoSerializer, responses={200: TokoSerializer})
     def put(self, request, toko_id):
-        if not request.user.groups.filter(name__in=["admin"]).exists():
+        if not is_admin(request):
             return Response(
                 {"detail": "Anda tidak memiliki izin untuk mengakses data ini."},
                 status=status.HTTP_403_FORBIDDEN
@@ -61,7 +62,7 @@ class TokoDetail(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, toko_id):
-        if not request.user.groups.filter(name__in=["admin"]).exists():
+        if not is_admin(request):
             return Response(
                 {"detail": "Anda tidak memiliki izin untuk mengakses data ini."},
                 status=status.HTTP_403_FORBIDDEN
@@ -75,20 +76,20 @@ class JalurList(APIView):
     
     @swagger_auto_schema(responses={200: JalurSerializer(many=True)})
     def get(self, request):
-        if request.user.groups.filter(name__in=["admin"]).exists():
+        if is_admin(request):
             jalur = Jalur.objects.all().order_by('-id')
-        elif request.user.groups.filter(name__in=["sales"]).exists():
+        elif is_sales(request):
             jalur = Jalur.objects.filter(users=request.user).order_by('-id')
         else:
             return Response(
                 {"detail": "Anda tidak memiliki izin untuk mengakses data ini."},
                 status=status.HTTP_403_FORBIDDEN
             )
-        serializer = JalurSerializer(jalur, many=True)
+        serializer = JalurSerializer(jalur.prefetch_related(TOKO_AKTIF_PREFETCH), many=True)
         return Response(serializer.data)
     
     def post(self, request):
-        if not request.user.groups.filter(name__in=["admin"]).exists():
+        if not is_admin(request):
             return Response(
                 {"detail": "Anda tidak memiliki izin untuk mengakses data ini."},
                 status=status.HTTP_403_FORBIDDEN
@@ -103,7 +104,7 @@ class JalurList(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def put(self, request, pk=None):
-        if not request.user.groups.filter(name__in=["admin"]).exists():
+        if not is_admin(request):
             return Response(
                 {"detail": "Anda tidak memiliki izin untuk mengakses data ini."},
                 status=status.HTTP_403_FORBIDDEN
@@ -116,15 +117,10 @@ class JalurList(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class AssignJalurM2MView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAdminRole]
 
     def post(self, request):
         serializer = AssignJalurM2MSerializer(data=request.data)
-        if not request.user.groups.filter(name__in=["admin"]).exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk mengakses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         if serializer.is_valid():
             user = serializer.save()
             return Response({
@@ -137,14 +133,9 @@ class AssignJalurM2MView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 class RemoveJalurFromUserAPIView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAdminRole]
     def post(self, request, *args, **kwargs):
         serializer = RemoveJalurFromUserSerializer(data=request.data)
-        if not request.user.groups.filter(name__in=["admin"]).exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk mengakses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         if serializer.is_valid():
             serializer.save()
             return Response({"status": True, "message": "Jalur berhasil dihapus dari user."})
@@ -158,16 +149,16 @@ def get_user_jalur(request, user_id):
     except User.DoesNotExist:
         return Response({"detail": "User tidak ditemukan"}, status=404)
 
-    jalur = user.jalur_list.all()  # relasi ManyToMany
+    jalur = user.jalur_list.prefetch_related(TOKO_AKTIF_PREFETCH)  # relasi ManyToMany
     serializer = JalurSerializer(jalur, many=True)
     return Response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_jalur_count(request):
-    if request.user.groups.filter(name__in=["admin"]).exists():
+    if is_admin(request):
         count = Jalur.objects.all().count()
-    elif request.user.groups.filter(name__in=["sales"]).exists():
+    elif is_sales(request):
         count = Jalur.objects.filter(users=request.user).count()
     else:
         count = 0
@@ -0,0 +1,87 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .permissions import ROLES_CLAIM
+
+JALUR_CLAIM = 'jalur_ids'
+
+
+class RoleTokenUser(TokenUser):
+    """User ringan yang dibangun dari claim access token (tanpa query auth_user)."""
+
+    @cached_property
+    def roles(self):
+        return frozenset(self.token.get(ROLES_CLAIM, []))
+
+    @cached_property
+    def jalur_ids(self):
+        return list(self.token.get(JALUR_CLAIM, []))
+
+
+class RevocationCache:
+    """
+    Cache in-process status user (is_active & hash password) dengan TTL pendek,
+    supaya user yang dinonaktifkan / ganti password tetap ditolak tanpa query
+    di setiap request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get(self, user_id, ttl):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(user_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        state = User.objects.filter(pk=user_id).values('is_active', 'password').first()
+        with self._lock:
+            self._data[user_id] = (now + ttl, state)
+        return state
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+revocation_cache = RevocationCache()
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication yang tidak memuat baris User: request.user adalah
+    RoleTokenUser dari claim (id, username, roles, jalur_ids).
+
+    settings.JWT_REVOCATION_CACHE_TTL (detik, default 30) mengatur seberapa
+    sering status user dicek ulang ke database; None mematikan pengecekan.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        ttl = getattr(settings, 'JWT_REVOCATION_CACHE_TTL', 30)
+        if ttl is not None:
+            state = revocation_cache.get(user_id, ttl)
+            if state is None:
+                raise AuthenticationFailed("User not found", code="user_not_found")
+            if api_settings.CHECK_USER_IS_ACTIVE and not state['is_active']:
+                raise AuthenticationFailed("User is inactive", code="user_inactive")
+            if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                    api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(state['password']):
+                raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+
+        return RoleTokenUser(validated_token)
@@ -0,0 +1,61 @@
+from django.contrib.auth.models import Group
+from rest_framework.permissions import BasePermission
+from rest_framework_simplejwt.models import TokenUser
+
+ROLES_CLAIM = 'roles'
+
+
+def get_roles(request):
+    """
+    Set nama group milik user yang sedang login, dihitung sekali per request.
+    Claim 'roles' di access token (lihat CustomTokenObtainPairSerializer) hanya
+    dipakai untuk user stateless (RoleTokenUser) tanpa query ke tabel group;
+    User dari database selalu membaca group terbaru.
+    """
+    roles = getattr(request, '_cached_roles', None)
+    if roles is not None:
+        return roles
+
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        roles = frozenset()
+    elif isinstance(user, TokenUser):
+        claim = user.token.get(ROLES_CLAIM)
+        if isinstance(claim, list):
+            roles = frozenset(claim)
+        else:
+            # Token lama tanpa claim roles
+            roles = frozenset(Group.objects.filter(user__id=user.id).values_list('name', flat=True))
+    else:
+        roles = frozenset(user.groups.values_list('name', flat=True))
+
+    request._cached_roles = roles
+    return roles
+
+
+def is_admin(request):
+    return 'admin' in get_roles(request)
+
+
+def is_sales(request):
+    return 'sales' in get_roles(request)
+
+
+class HasRole(BasePermission):
+    roles = ()
+    message = "Anda tidak memiliki izin untuk mengakses data ini."
+
+    def has_permission(self, request, view):
+        return bool(get_roles(request) & set(self.roles))
+
+
+class IsAdminRole(HasRole):
+    roles = ('admin',)
+
+
+class IsSalesRole(HasRole):
+    roles = ('sales',)
+
+
+class IsAdminOrSales(HasRole):
+    roles = ('admin', 'sales')
@@ -4,11 +4,32 @@ from .models import Personal
 from django.db import transaction
 from rest_framework import serializers
 from .models import Personal
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from .permissions import ROLES_CLAIM
+from .authentication import JALUR_CLAIM
+from toko.models import Jalur
 from rest_framework import serializers
 from rest_framework.exceptions import AuthenticationFailed
 
+def get_user_roles(user_id):
+    return list(Group.objects.filter(user__id=user_id).order_by('name').values_list('name', flat=True))
+
+
+def get_user_jalur_ids(user_id):
+    return list(Jalur.objects.filter(users__id=user_id).order_by('id').values_list('id', flat=True))
+
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.username
+        token[ROLES_CLAIM] = get_user_roles(user.id)
+        token[JALUR_CLAIM] = get_user_jalur_ids(user.id)
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
 
@@ -23,6 +44,18 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         data['role'] = group.name if group else None 
 
         return data
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Claim roles & jalur_ids di access token baru selalu diambil ulang dari database."""
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        user_id = access[api_settings.USER_ID_CLAIM]
+        access[ROLES_CLAIM] = get_user_roles(user_id)
+        access[JALUR_CLAIM] = get_user_jalur_ids(user_id)
+        data['access'] = str(access)
+        return data
  
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -1,3 +1,101 @@
-from django.test import TestCase
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, User, Group
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .authentication import RoleTokenUser, revocation_cache
+from .permissions import HasRole, IsAdminRole, IsSalesRole, IsAdminOrSales
+from .serializer import CustomTokenObtainPairSerializer
+
+
+def request_untuk(user):
+    return SimpleNamespace(user=user)
+
+
+class RolePermissionTest(TestCase):
+    def setUp(self):
+        self.sales = User.objects.create_user('sales', password='rahasia')
+        self.sales.groups.add(Group.objects.create(name='sales'))
+        self.token = CustomTokenObtainPairSerializer.get_token(self.sales).access_token
+
+    def izin(self, request):
+        return [permission().has_permission(request, None) for permission in (IsAdminRole, IsSalesRole, IsAdminOrSales)]
+
+    def test_claim_dipakai_untuk_user_stateless(self):
+        self.token['roles'] = ['admin']
+        request = request_untuk(RoleTokenUser(self.token))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.izin(request), [True, False, True])
+
+    def test_tanpa_claim_membaca_group(self):
+        del self.token['roles']
+        request = request_untuk(RoleTokenUser(self.token))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.izin(request), [False, True, True])
+
+    def test_user_database_mengabaikan_claim(self):
+        self.token['roles'] = ['admin']
+        request = SimpleNamespace(user=self.sales, auth=self.token)
+        self.assertEqual(self.izin(request), [False, True, True])
+
+    def test_tanpa_role_ditolak(self):
+        self.assertEqual(self.izin(request_untuk(AnonymousUser())), [False, False, False])
+        self.sales.groups.clear()
+        self.assertEqual(self.izin(request_untuk(self.sales)), [False, False, False])
+        self.assertFalse(HasRole().has_permission(request_untuk(self.sales), None))
+
+    def test_group_dicabut_langsung_berlaku(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(client.get('/api/transaksi-pengambilan/getall').status_code, 200)
+
+        self.sales.groups.clear()
+        self.assertEqual(client.get('/api/transaksi-pengambilan/getall').status_code, 403)
+
+
+class StatelessJWTTest(TestCase):
+    def setUp(self):
+        revocation_cache.clear()
+        self.sales = User.objects.create_user('sales', password='rahasia')
+        self.sales.groups.add(Group.objects.create(name='sales'))
+        self.client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(self.sales).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def status_setelah(self, detik):
+        sekarang = time.monotonic()
+        with mock.patch('user.authentication.time.monotonic', return_value=sekarang + detik):
+            return self.client.get('/api/products/').status_code
+
+    def test_tanpa_query_user_dan_group(self):
+        self.client.get('/api/products/')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in context.captured_queries if '"auth_' in query['sql']])
+
+    @override_settings(JWT_REVOCATION_CACHE_TTL=30)
+    def test_user_nonaktif_ditolak_setelah_ttl(self):
+        self.assertEqual(self.client.get('/api/products/').status_code, 200)
+        User.objects.filter(pk=self.sales.pk).update(is_active=False)
+        self.assertEqual(self.status_setelah(10), 200)
+        self.assertEqual(self.status_setelah(31), 401)
+
+    @override_settings(JWT_REVOCATION_CACHE_TTL=30)
+    def test_ganti_password_ditolak_setelah_ttl(self):
+        self.assertEqual(self.client.get('/api/products/').status_code, 200)
+        self.sales.set_password('baru12345')
+        self.sales.save()
+        self.assertEqual(self.status_setelah(31), 401)
+
+    @override_settings(JWT_REVOCATION_CACHE_TTL=None)
+    def test_ttl_none_tanpa_pengecekan(self):
+        User.objects.filter(pk=self.sales.pk).update(is_active=False)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get('/api/products/').status_code, 200)
+        self.assertFalse([query for query in context.captured_queries if '"auth_user"' in query['sql']])
@@ -1,11 +1,10 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (TokenRefreshView)
 from .views import *
 
 
 urlpatterns = [
     path('token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('register/', RegisterView.as_view(), name='register'),
     path('edit/user/', EditUserView.as_view(), name='edit-user'),
     path('me/', MeView.as_view(), name='me'),
@@ -9,13 +9,23 @@ from django.contrib.auth.models import Group, User
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view
 
-from rest_framework_simplejwt.views import TokenObtainPairView
-from user.serializer import CustomTokenObtainPairSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from user.serializer import CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer
+from user.permissions import IsAdminRole
+from BE import metrics
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+
+    def post(self, request, *args, **kwargs):
+        metrics.incr('auth.token_refresh')
+        return super().post(request, *args, **kwargs)
+
+
 @api_view(['GET'])
 def get_all_sales(request):
     if not request.user.is_authenticated:
@@ -89,17 +99,11 @@ class GroupDetailAPIView(APIView):
         return Response({"message": "Group deleted."}, status=status.HTTP_204_NO_CONTENT)
     
 class AddUserToGroupAPIView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAdminRole]
 
     def post(self, request):
         username = request.data.get('username')
         group_name = request.data.get('group')
-        
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk mengakses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
 
         if not username or not group_name:
             return Response({"error": "username and group are required."}, status=status.HTTP_400_BAD_REQUEST)
@@ -111,17 +115,11 @@ class AddUserToGroupAPIView(APIView):
         return Response({"message": f"User '{username}' added to group '{group_name}'."}, status=status.HTTP_200_OK)
     
 class RemoveUserFromGroupAPIView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAdminRole]
 
     def post(self, request):
         username = request.data.get('username')
         group_name = request.data.get('group')
-        
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk mengakses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
 
         if not username or not group_name:
             return Response({"error": "username and group are required."}, status=status.HTTP_400_BAD_REQUEST)
@@ -139,15 +137,9 @@ class RemoveUserFromGroupAPIView(APIView):
         
         
 class GetAllUsersAPIView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAdminRole]
 
     def get(self, request):
-        if not request.user.groups.filter(name="admin").exists():
-            return Response(
-                {"detail": "Anda tidak memiliki izin untuk mengakses data ini."},
-                status=status.HTTP_403_FORBIDDEN
-            )
-
         users = User.objects.all().order_by('-id').exclude(groups__name='admin')
         serializer = UserDetailSerializer(users, many=True)
         return Response(serializer.data)